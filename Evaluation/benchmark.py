@@ -0,0 +1,169 @@
+"""
+This module is a headless benchmark of graph building and shortest path queries, writing machine-readable JSON results.
+"""
+
+import sys
+import os
+
+# Add the parent directory to the sys.path to import custom modules
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from get_data import extract_city_data
+from synthetic_data import generate_city_data
+from make_graph import add_edges_to_degree, build_coordinate_index, create_adjacency_list, generate_mst
+from csr_graph import adjacency_to_csr
+from sspp_solvers import astar, dijkstra
+from search_stats import SearchStats
+from priority_queues import QUEUES
+import argparse
+import json
+import platform
+import random
+import subprocess
+import time
+import tracemalloc
+import numpy as np
+
+def measure(function, *args):
+    """Calls function once and returns its result, the wall time in seconds and the peak traced memory in bytes."""
+    tracemalloc.start()
+    start_time = time.perf_counter()
+    result = function(*args)
+    elapsed = time.perf_counter() - start_time
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak_memory
+
+def time_only(function, *args):
+    """Calls function once without memory tracing and returns its result and the wall time in seconds."""
+    start_time = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start_time
+
+def summarize(latencies, expanded):
+    """Returns latency percentiles in milliseconds and the mean and 95th percentile of expanded nodes."""
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        'queries': len(latencies),
+        'latency_ms_p50': float(np.percentile(latencies_ms, 50)),
+        'latency_ms_p95': float(np.percentile(latencies_ms, 95)),
+        'latency_ms_mean': float(latencies_ms.mean()),
+        'nodes_expanded_mean': float(np.mean(expanded)),
+        'nodes_expanded_p95': float(np.percentile(expanded, 95)),
+    }
+
+def benchmark_graph(city_data_df, desired_degree, epsilons, num_queries, seed, queues=()):
+    """Benchmarks the graph build phases and all query algorithms on one graph configuration."""
+    cities = city_data_df[['city', 'lat', 'lng']].values.tolist()
+    result = {'nodes': len(cities), 'desired_degree': desired_degree, 'build': {}, 'queries': {}}
+
+    # Time the build phases separately, then trace their peak memory in a second run (tracing slows Python down)
+    mst_edges, mst_time = time_only(generate_mst, cities)
+    adj_list = create_adjacency_list(mst_edges, cities)
+    adj_list, degree_time = time_only(add_edges_to_degree, adj_list, cities, desired_degree)
+    _, _, mst_memory = measure(generate_mst, cities)
+    _, _, degree_memory = measure(add_edges_to_degree, create_adjacency_list(mst_edges, cities), cities, desired_degree)
+    result['build']['generate_mst'] = {'seconds': mst_time, 'peak_memory_bytes': mst_memory}
+    result['build']['add_edges_to_degree'] = {'seconds': degree_time, 'peak_memory_bytes': degree_memory}
+
+    graph = adjacency_to_csr(adj_list, [city[0] for city in cities])
+    coords = build_coordinate_index(city_data_df)
+    result['edges'] = graph.num_edges // 2
+
+    # The same seeded city pairs are used for every algorithm
+    rng = random.Random(seed)
+    pairs = []
+    for _ in range(num_queries):
+        start, end = rng.sample(range(graph.num_nodes), 2)
+        pairs.append((graph.names[start], graph.names[end]))
+
+    algorithms = [('dijkstra', lambda start, end, stats=None: dijkstra(graph, start, end, stats=stats))]
+
+    # The dict adjacency list is the reference the array-backed graph has to beat (timed without stats, so on the dict loop)
+    algorithms.append(('dijkstra_adjacency_list', lambda start, end, stats=None: dijkstra(adj_list, start, end, stats=stats)))
+    algorithms.append(('astar_adjacency_list', lambda start, end, stats=None: astar(adj_list, start, end, coords=coords, stats=stats)))
+    for e in epsilons:
+        algorithms.append((f'astar_epsilon_{e}', lambda start, end, stats=None, e=e: astar(graph, start, end, epsilon=e, coords=coords, stats=stats)))
+
+    # Every pluggable priority queue runs Dijkstra and A* (epsilon 1, the monotone queues need it) next to the default heapq loop
+    for q in queues:
+        algorithms.append((f'dijkstra_queue_{q}', lambda start, end, stats=None, q=q: dijkstra(graph, start, end, stats=stats, queue=q)))
+        algorithms.append((f'astar_queue_{q}', lambda start, end, stats=None, q=q: astar(graph, start, end, coords=coords, stats=stats, queue=q)))
+
+    for name, run in algorithms:
+        # Latencies come from the uninstrumented solvers, the effort counters from a second pass with SearchStats
+        latencies = [time_only(run, start, end)[1] for start, end in pairs]
+        expanded = []
+        pushes = []
+        for start, end in pairs:
+            stats = SearchStats(record_checked=False)
+            run(start, end, stats)
+            expanded.append(stats.pops)
+            pushes.append(stats.pushes)
+        result['queries'][name] = summarize(latencies, expanded)
+        result['queries'][name]['pushes_mean'] = float(np.mean(pushes))
+        # Peak memory of a single query on the first pair
+        _, _, result['queries'][name]['peak_memory_bytes'] = measure(run, *pairs[0])
+    return result
+
+def git_commit():
+    """Returns the current git commit of the repository, or None outside of a git checkout."""
+    try:
+        output = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        return output.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def parse_args(argv=None):
+    """Parses the sweep configuration from the command line (or from argv)."""
+    parser = argparse.ArgumentParser(description='Benchmark graph building and shortest path queries.')
+    parser.add_argument('--csv-file', default='Data/uscities.csv', help='City data for the --min-population sweep')
+    parser.add_argument('--min-population', type=int, nargs='*', default=[], help='Population thresholds of real city data')
+    parser.add_argument('--nodes', type=int, nargs='*', default=[], help='Numbers of synthetic cities')
+    parser.add_argument('--degrees', type=int, nargs='+', default=[3, 7, 20], help='Desired degrees')
+    parser.add_argument('--epsilons', type=float, nargs='+', default=[1, 1.2, 1.5, 2, 3], help='Weights of the A* heuristic')
+    parser.add_argument('--queues', nargs='*', default=QUEUES, choices=QUEUES, help='Priority queues benchmarked against the default heapq loop')
+    parser.add_argument('--queries', type=int, default=100, help='Number of random city pairs per configuration')
+    parser.add_argument('--seed', type=int, default=42, help='Seed for synthetic cities and city pairs')
+    parser.add_argument('--output', default='benchmark.json', help='JSON file the results are written to')
+    args = parser.parse_args(argv)
+    if not args.min_population and not args.nodes:
+        args.min_population = [500000, 100000]
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    # All city sets of the sweep, real data by population threshold and synthetic data by size
+    datasets = []
+    for p in args.min_population:
+        datasets.append(({'source': 'csv', 'min_population': p}, extract_city_data(args.csv_file, p)))
+    for n in args.nodes:
+        datasets.append(({'source': 'synthetic', 'nodes': n}, generate_city_data(n, seed=args.seed)))
+
+    results = []
+    for dataset, city_data_df in datasets:
+        for d in args.degrees:
+            result = benchmark_graph(city_data_df, d, args.epsilons, args.queries, args.seed, args.queues)
+            result['dataset'] = dataset
+            results.append(result)
+            print(f"{dataset} degree {d}: build {result['build']['generate_mst']['seconds'] + result['build']['add_edges_to_degree']['seconds']:.2f}s, "
+                  f"dijkstra p50 {result['queries']['dijkstra']['latency_ms_p50']:.2f}ms")
+
+    report = {
+        'meta': {
+            'git_commit': git_commit(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+        },
+        'config': vars(args),
+        'results': results,
+    }
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=2)
+    print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
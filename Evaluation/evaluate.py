@@ -9,8 +9,10 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from get_data import extract_city_data
-from make_graph import generate_random_graph
-from sspp_solvers import astar, dijkstra
+from make_graph import build_coordinate_index, generate_random_graph
+from sspp_solvers import astar, batch_dijkstra
+from parallel_runner import ParallelRunner, run_grouped_pairs
+from search_stats import SearchStats
 import random
 import matplotlib.pyplot as plt
 import numpy as np
@@ -21,6 +23,18 @@ def get_random_city_name(df):
     random_city_name = df.iloc[random_index]['city']
     return random_city_name
 
+def evaluate_start(graph, coords, task):
+    """Runs Dijkstra and A* from one start city to all its end cities, returning the path lengths and checked nodes per pair."""
+    start, ends = task
+    results = []
+    # Dijkstra needs a single search for all end cities of this start city
+    results_dijkstra = batch_dijkstra(graph, [(start, end) for end in ends])
+    for end, (path_dijkstra, _, checked_dijkstra) in zip(ends, results_dijkstra):
+        stats_astar = SearchStats(record_checked=False)
+        path_astar, _, _ = astar(graph, start, end, coords=coords, stats=stats_astar)
+        results.append((len(path_dijkstra), checked_dijkstra, len(path_astar), stats_astar.pops))
+    return results
+
 def plot_result(total_edges, avg_checked_nodes_dijkstra, avg_checked_nodes_astar, nodes):
     """Plots the average number of checked nodes for different path lengths for Dijkstra and A* algorithms."""
     
@@ -63,9 +77,17 @@ def main():
     iterations = 200
     city_pairs = []
 
+    # Fixed seed for the city pairs and number of worker processes
+    seed = 42
+    workers = os.cpu_count()
+    random.seed(seed)
+
     # Extract city data from the CSV file
     city_data_df = extract_city_data(csv_file, min_population)
 
+    # Precompute the coordinate table for the A* heuristic once
+    coords = build_coordinate_index(city_data_df)
+
     # Generate random city pairs for the evaluation
     for _ in range(iterations):
         start = get_random_city_name(city_data_df)
@@ -77,25 +99,19 @@ def main():
     # Evaluate the algorithms for each desired degree
     for d in desired_degree:
         # Generate a random graph with the given degree
-        adj_list = generate_random_graph(city_data_df, d)
-        total_edges = sum(len(neighbors) for neighbors in adj_list.values()) // 2
+        graph = generate_random_graph(city_data_df, d, as_csr=True)
+        total_edges = graph.num_edges // 2
 
         # Dictionaries to store path lengths and checked nodes
         path_data_dijkstra = {}
         path_data_astar = {}
 
-        # Run the algorithms for each city pair
-        for start, end in city_pairs:
-            # Run Dijkstra's algorithm
-            path_dijkstra, _, checked_nodes_dijkstra = dijkstra(adj_list, start, end)
-            length_dijkstra = len(path_dijkstra)
-            checked_dijkstra = len(checked_nodes_dijkstra)
-
-            # Run A* algorithm
-            path_astar, _, checked_nodes_astar = astar(adj_list, start, end, city_data_df)
-            length_astar = len(path_astar)
-            checked_astar = len(checked_nodes_astar)
+        # Run the algorithms for all city pairs on the worker processes
+        with ParallelRunner(graph, coords, workers) as runner:
+            results = run_grouped_pairs(runner, evaluate_start, city_pairs)
 
+        # Store the results in the order of the city pairs
+        for length_dijkstra, checked_dijkstra, length_astar, checked_astar in results:
             # Store results for Dijkstra
             if length_dijkstra not in path_data_dijkstra:
                 path_data_dijkstra[length_dijkstra] = []
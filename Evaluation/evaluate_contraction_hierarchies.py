@@ -0,0 +1,73 @@
+"""
+This module is used to check that Contraction Hierarchies find the same shortest path distances as the Dijkstra Algorithm.
+"""
+
+import sys
+import os
+
+# Add the parent directory to the sys.path to import custom modules
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from get_data import extract_city_data
+from make_graph import generate_random_graph
+from sspp_solvers import dijkstra
+from contraction_hierarchies import build_contraction_hierarchy
+import math
+import random
+import time
+
+def get_random_city_name(df):
+    """Selects a random city name from the DataFrame."""
+    random_index = random.randint(0, len(df) - 1)
+    random_city_name = df.iloc[random_index]['city']
+    return random_city_name
+
+def main():
+    # CSV file containing city data
+    csv_file = 'Data/uscities.csv'
+    min_population = 100000
+    desired_degree = [3, 7, 20]
+    iterations = 200
+    city_pairs = []
+
+    # Extract city data from the CSV file
+    city_data_df = extract_city_data(csv_file, min_population)
+
+    # Generate random city pairs for the evaluation
+    for _ in range(iterations):
+        start = get_random_city_name(city_data_df)
+        end = get_random_city_name(city_data_df)
+        while end == start:
+            end = get_random_city_name(city_data_df)
+        city_pairs.append((start, end))
+
+    mismatches = []
+    for d in desired_degree:
+        # Generate a random graph with the given degree and preprocess it
+        adj_list = generate_random_graph(city_data_df, d)
+        start_time = time.perf_counter()
+        hierarchy = build_contraction_hierarchy(adj_list)
+        preprocessing_time = time.perf_counter() - start_time
+
+        # Compare the distance of every city pair with Dijkstra's algorithm
+        checked_dijkstra = 0
+        checked_ch = 0
+        for start, end in city_pairs:
+            _, weight_dijkstra, checked_nodes_dijkstra = dijkstra(adj_list, start, end)
+            _, weight_ch, checked_nodes_ch = hierarchy.query(start, end)
+            checked_dijkstra += len(checked_nodes_dijkstra)
+            checked_ch += len(checked_nodes_ch)
+            if not math.isclose(weight_dijkstra, weight_ch, rel_tol=1e-9):
+                mismatches.append((d, start, end, weight_dijkstra, weight_ch))
+
+        print(f"Desired degree {d}: preprocessing {preprocessing_time:.2f}s, {len(hierarchy.targets)} upward edges, "
+              f"average checked nodes Dijkstra {checked_dijkstra / iterations:.1f} vs CH {checked_ch / iterations:.1f}")
+
+    # Every distance has to match Dijkstra's exactly (up to floating point rounding)
+    for d, start, end, weight_dijkstra, weight_ch in mismatches:
+        print(f"Mismatch for desired degree {d}, {start} -> {end}: Dijkstra {weight_dijkstra}, CH {weight_ch}")
+    assert not mismatches, f"{len(mismatches)} distances differ from Dijkstra"
+    print("All distances match Dijkstra.")
+
+if __name__ == "__main__":
+    main()
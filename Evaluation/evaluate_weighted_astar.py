@@ -9,8 +9,10 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from get_data import extract_city_data
-from make_graph import generate_random_graph
-from sspp_solvers import astar, dijkstra
+from make_graph import build_coordinate_index, generate_random_graph
+from sspp_solvers import astar_sweep, batch_dijkstra
+from parallel_runner import ParallelRunner, run_grouped_pairs
+from functools import partial
 import random
 import matplotlib.pyplot as plt
 
@@ -51,6 +53,18 @@ def plot_results(epsilons, results):
     plt.title(f'Average Error and Calculation Time weighted A* vs Dijkstra for Graph with {nodes} Nodes')
     plt.show()
 
+def evaluate_start(graph, coords, task, epsilons):
+    """Runs Dijkstra and weighted A* for every epsilon from one start city to all its end cities."""
+    start, ends = task
+    # One Dijkstra search from the start is the baseline of all its end cities
+    baselines = batch_dijkstra(graph, [(start, end) for end in ends])
+    results = []
+    for end, baseline in zip(ends, baselines):
+        # Run weighted A* for each epsilon, the expanded nodes are read from the SearchStats of every search
+        (_, weight, checked_nodes), results_astar = astar_sweep(graph, start, end, epsilons, coords=coords, baseline=baseline)
+        results.append((weight, checked_nodes, [(weight_astar, stats_astar.pops) for _, weight_astar, stats_astar in results_astar]))
+    return results
+
 def get_random_city_name(df):
     """Selects a random city name from the DataFrame."""
     random_index = random.randint(0, len(df) - 1)
@@ -65,9 +79,17 @@ def main():
     epsilons = [1, 1.2, 1.5, 2, 3]
     iterations = 100
 
+    # Fixed seed for the city pairs and number of worker processes
+    seed = 42
+    workers = os.cpu_count()
+    random.seed(seed)
+
     # Loop through different minimum population thresholds
     for p in min_population:
         city_data_df = extract_city_data(csv_file, p)
+
+        # Precompute the coordinate table for the A* heuristic once per city set
+        coords = build_coordinate_index(city_data_df)
         city_pairs = []
 
         # Generate random city pairs for the evaluation
@@ -81,31 +103,30 @@ def main():
         results = []
         # Loop through different desired degrees for the graph
         for d in desired_degree:
-            adj_list = generate_random_graph(city_data_df, d)
+            graph = generate_random_graph(city_data_df, d, as_csr=True)
             cumulative_errors = {e: 0 for e in epsilons}
             cumulative_checked_nodes = {e: 0 for e in epsilons}
 
-            # Evaluate the algorithms for each city pair
-            for start, end in city_pairs:
-                # Run Dijkstra's algorithm
-                _, weight, checked_nodes = dijkstra(adj_list, start, end)
-                # Run weighted A* algorithm for each epsilon
-                for e in epsilons:
-                    _, weight_astar, checked_nodes_astar = astar(adj_list, start, end, city_data_df, epsilon=e)
-                    
+            # Evaluate the algorithms for each city pair on the worker processes
+            with ParallelRunner(graph, coords, workers) as runner:
+                pair_results = run_grouped_pairs(runner, partial(evaluate_start, epsilons=epsilons), city_pairs)
+
+            # Accumulate the results in the order of the city pairs
+            for weight, checked_nodes, results_astar in pair_results:
+                for e, (weight_astar, checked_nodes_astar) in zip(epsilons, results_astar):
                     # Calculate error and add to cumulative error
                     error = ((weight_astar / weight) * 100) - 100
                     cumulative_errors[e] += error
                     
                     # Calculate node check relation and add to cumulative value
-                    checked_nodes_relation = (len(checked_nodes_astar) / len(checked_nodes)) * 100
+                    checked_nodes_relation = (checked_nodes_astar / checked_nodes) * 100
                     cumulative_checked_nodes[e] += checked_nodes_relation
 
             # Calculate average errors and checked nodes relations
             average_errors = [cumulative_errors[e] / iterations for e in epsilons]
             average_checked_nodes_relations = [cumulative_checked_nodes[e] / iterations for e in epsilons]
 
-            total_edges = sum(len(neighbors) for neighbors in adj_list.values()) // 2
+            total_edges = graph.num_edges // 2
             results.append((d, total_edges, len(city_data_df), average_checked_nodes_relations, average_errors))
 
         # Plot the results
@@ -0,0 +1,98 @@
+"""
+This module runs evaluation tasks on a process pool, with the graph and the coordinate table placed in shared memory once.
+"""
+
+import sys
+import os
+
+# Add the parent directory to the sys.path to import custom modules
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from csr_graph import CSRGraph
+from make_graph import CoordinateIndex
+from functools import partial
+from multiprocessing import Pool, shared_memory
+import numpy as np
+
+# Graph and coordinate table of the current worker process, attached once by init_worker
+_worker_state = {}
+
+def share_array(array, blocks):
+    """Copies an array into a new shared memory block and returns the (name, shape, dtype) needed to attach it."""
+    block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+    blocks.append(block)
+    return block.name, array.shape, array.dtype.str
+
+def attach_array(description, blocks):
+    """Attaches to a shared memory block created by share_array and returns it as an array without copying."""
+    name, shape, dtype = description
+    block = shared_memory.SharedMemory(name=name)
+    blocks.append(block)
+    return np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+
+def init_worker(descriptions, names):
+    """Rebuilds the graph and the coordinate table of a worker on top of the shared arrays."""
+    blocks = []
+    arrays = {key: attach_array(description, blocks) for key, description in descriptions.items()}
+    _worker_state['blocks'] = blocks  # Keep the blocks open for as long as the worker lives
+    _worker_state['graph'] = CSRGraph(arrays['offsets'], arrays['targets'], arrays['weights'], names)
+    _worker_state['coords'] = CoordinateIndex.from_radians(names, arrays['lat'], arrays['lng'])
+
+def run_task(function, item):
+    """Runs one task in a worker with the shared graph and coordinate table."""
+    return function(_worker_state['graph'], _worker_state['coords'], item)
+
+class ParallelRunner:
+    """Process pool whose workers share a single copy of the graph arrays and the coordinate table."""
+
+    def __init__(self, graph, coords, workers=None):
+        self.graph = graph
+        self.coords = coords
+        self.workers = workers or os.cpu_count()
+        self._blocks = []
+        self._pool = None
+
+        # With a single worker everything runs in this process, otherwise the arrays are copied into shared memory once
+        if self.workers > 1:
+            arrays = {'offsets': graph.offsets, 'targets': graph.targets, 'weights': graph.weights, 'lat': coords.lat, 'lng': coords.lng}
+            descriptions = {key: share_array(np.ascontiguousarray(array), self._blocks) for key, array in arrays.items()}
+            self._pool = Pool(self.workers, initializer=init_worker, initargs=(descriptions, graph.names))
+
+    def map(self, function, items, chunksize=1):
+        """Calls function(graph, coords, item) for every item and returns the results in the order of the items."""
+        if self._pool is None:
+            return [function(self.graph, self.coords, item) for item in items]
+        return self._pool.map(partial(run_task, function), items, chunksize)
+
+    def close(self):
+        """Stops the workers and frees the shared memory."""
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def run_grouped_pairs(runner, function, city_pairs):
+    """Runs function(graph, coords, (start, ends)) once per start city and returns one result per city pair, in pair order."""
+    # Group the pairs by start city, keeping the order in which start cities first appear
+    positions_by_start = {}
+    for position, (start, _) in enumerate(city_pairs):
+        positions_by_start.setdefault(start, []).append(position)
+    tasks = [(start, [city_pairs[position][1] for position in positions]) for start, positions in positions_by_start.items()]
+
+    # Put every result back at the position of its pair, so merging does not depend on which worker finished first
+    results = [None] * len(city_pairs)
+    for positions, group_results in zip(positions_by_start.values(), runner.map(function, tasks)):
+        for position, result in zip(positions, group_results):
+            results[position] = result
+    return results
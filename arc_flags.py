@@ -0,0 +1,147 @@
+"""
+This module contains an arc-flags accelerator that partitions the cities by state and prunes every search to the edges leading toward the target's region.
+"""
+
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra as csgraph_dijkstra
+from csr_graph import CSRGraph, FifoCache, NamedNodes, as_csr_graph
+
+# Number of boundary nodes searched together, each one needs a distance row over all nodes and edges
+BOUNDARY_CHUNK = 32
+
+# The graph of a worker process, set once by init_worker
+_worker_state = {}
+
+class ArcFlags(NamedNodes):
+    """One bitset per region over all edges of a graph, bit e is set if edge e lies on a shortest path to some node of the region."""
+
+    def __init__(self, flags, node_regions, region_names, names, num_edges, graph_digest, max_cached_graphs=2):
+        self.flags = flags  # Packed bits of every region (rows), np.packbits over the edge positions of the CSRGraph
+        self.node_regions = node_regions  # Region of every node id
+        self.region_names = list(region_names)  # State or group name of every region
+        self.names = list(names)  # City name of every node id
+        self.num_edges = num_edges  # Number of (directed) edges the bitsets cover
+        self.graph_digest = graph_digest  # Digest of the edges and weights the flags were computed for
+        self._pruned = FifoCache(max_cached_graphs)  # id of a checked graph -> (graph, CSRGraph, {region: graph with only the flagged edges of that region})
+
+    def region_mask(self, region):
+        """Returns the flags of one region as a boolean array over the edges."""
+        return np.unpackbits(self.flags[region], count=self.num_edges).astype(bool)
+
+    def check_graph(self, graph):
+        """Raises a ValueError unless the CSRGraph has the node order, edges and weights the flags were computed for."""
+        if graph.names != self.names:
+            raise ValueError("The arc flags were computed for another node order")
+        if graph.num_edges != self.num_edges or edge_digest(graph) != self.graph_digest:
+            raise ValueError("The arc flags were computed for other edges or weights")
+
+    def pruned_graph(self, graph, end):
+        """Returns the graph reduced to the edges flagged for the region of end, built once per graph and region."""
+        # A graph is converted and checked once, the entry keeps it so its id cannot be reused by another graph meanwhile
+        cached = self._pruned.get(id(graph))
+        if cached is None or cached[0] is not graph:
+            csr_graph = as_csr_graph(graph, self.names)
+            self.check_graph(csr_graph)
+            cached = (graph, csr_graph, {})
+            self._pruned[id(graph)] = cached
+
+        # Every region of a checked graph is pruned once and kept
+        _, csr_graph, regions = cached
+        region = int(self.node_regions[self.node_id(end)])
+        if region not in regions:
+            mask = self.region_mask(region)
+            kept = np.concatenate(([0], np.cumsum(mask)))
+            regions[region] = CSRGraph(kept[csr_graph.offsets], csr_graph.targets[mask], csr_graph.weights[mask], csr_graph.names)
+        return regions[region]
+
+    def save(self, file_path):
+        """Saves the arc flags to a NumPy .npz file."""
+        np.savez(file_path, flags=self.flags, node_regions=self.node_regions, region_names=np.array(self.region_names), names=np.array(self.names), num_edges=self.num_edges, graph_digest=self.graph_digest)
+
+def load_arc_flags(file_path):
+    """Loads arc flags saved with ArcFlags.save."""
+    with np.load(file_path, allow_pickle=False) as data:
+        return ArcFlags(data['flags'], data['node_regions'], data['region_names'].tolist(), data['names'].tolist(), int(data['num_edges']), str(data['graph_digest']))
+
+def edge_digest(graph):
+    """Returns a SHA-256 hex digest of the offsets, targets and weights of a CSRGraph."""
+    digest = hashlib.sha256()
+    for array, dtype in ((graph.offsets, np.int64), (graph.targets, np.int64), (graph.weights, np.float64)):
+        digest.update(np.ascontiguousarray(array, dtype=dtype).tobytes())
+    return digest.hexdigest()
+
+def state_regions(city_data_df, groups=None):
+    """Assigns every city (in DataFrame row order) to its state, or to the group of its state in the optional {state: group} dictionary."""
+    groups = groups or {}
+    labels = [groups.get(state, state) for state in city_data_df['state_name'].astype(str)]
+    region_names, node_regions = np.unique(np.array(labels), return_inverse=True)
+    return region_names.tolist(), node_regions.astype(np.int32)
+
+def edge_sources(graph):
+    """Returns the source node id of every edge of a CSRGraph."""
+    return np.repeat(np.arange(graph.num_nodes), np.diff(graph.offsets))
+
+def region_flags(graph, reverse_matrix, node_regions, region):
+    """Computes the packed flags of one region from the shortest path distances to its boundary nodes."""
+    sources, targets, weights = edge_sources(graph), graph.targets, graph.weights
+    members = node_regions == region
+
+    # Edges inside the region are always flagged
+    flags = members[sources] & members[targets]
+
+    # A shortest path from outside enters the region at a boundary node, a node of the region with an edge leaving it
+    boundary = np.unique(sources[members[sources] & ~members[targets]])
+    for i in range(0, len(boundary), BOUNDARY_CHUNK):
+        # Distances to the boundary nodes, searched on the reversed edges
+        distances = csgraph_dijkstra(reverse_matrix, indices=boundary[i:i + BOUNDARY_CHUNK])
+        source_distances = distances[:, sources]
+
+        # Edge (u, v) lies on a shortest path to the boundary node if d(u) = w + d(v), up to rounding
+        on_path = weights + distances[:, targets] <= source_distances * (1 + 1e-12)
+        flags |= (on_path & np.isfinite(source_distances)).any(axis=0)
+    return np.packbits(flags)
+
+def reverse_csr_matrix(graph):
+    """Returns the transposed sparse matrix of a CSRGraph, so scipy searches follow the edges backward."""
+    matrix = csr_matrix((graph.weights, graph.targets, graph.offsets), shape=(graph.num_nodes, graph.num_nodes))
+    return matrix.T.tocsr()
+
+def init_worker(offsets, targets, weights, node_regions):
+    """Rebuilds the graph once per worker process."""
+    graph = CSRGraph(offsets, targets, weights, range(len(node_regions)))
+    _worker_state['graph'] = graph
+    _worker_state['reverse_matrix'] = reverse_csr_matrix(graph)
+    _worker_state['node_regions'] = node_regions
+
+def run_region(region):
+    """Computes the packed flags of one region in a worker."""
+    return region_flags(_worker_state['graph'], _worker_state['reverse_matrix'], _worker_state['node_regions'], region)
+
+def build_arc_flags(graph, city_data_df, groups=None, workers=None):
+    """Partitions the cities by state (or by state groups) and computes the arc flags of every region, regions run in parallel."""
+    graph = as_csr_graph(graph, city_data_df['city'].tolist())
+    region_names, row_regions = state_regions(city_data_df, groups)
+
+    # The regions follow the DataFrame rows, a CSRGraph may order its nodes differently
+    rows = {city: row for row, city in enumerate(city_data_df['city'].tolist())}
+    missing = [name for name in graph.names if name not in rows]
+    if missing:
+        raise ValueError(f"The city table has no entry for city: {missing[0]}")
+    node_regions = row_regions[[rows[name] for name in graph.names]]
+    regions = range(len(region_names))
+    workers = workers or os.cpu_count()
+
+    if workers > 1:
+        # Every worker receives the graph once and then computes whole regions
+        with ProcessPoolExecutor(workers, initializer=init_worker, initargs=(graph.offsets, graph.targets, graph.weights, node_regions)) as pool:
+            rows = list(pool.map(run_region, regions))
+    else:
+        reverse_matrix = reverse_csr_matrix(graph)
+        rows = [region_flags(graph, reverse_matrix, node_regions, region) for region in regions]
+
+    flags = np.vstack(rows) if rows else np.zeros((0, (graph.num_edges + 7) // 8), dtype=np.uint8)
+    return ArcFlags(flags, node_regions, region_names, graph.names, graph.num_edges, edge_digest(graph))
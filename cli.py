@@ -0,0 +1,103 @@
+"""
+This module is a command line entry point with the subcommands build, query, bench and plot, each importing only the modules it needs.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+def add_graph_arguments(parser):
+    """Adds the arguments that select the cached graph."""
+    parser.add_argument('--csv-file', default='Data/uscities.csv')
+    parser.add_argument('--min-population', type=int, default=500000)
+    parser.add_argument('--desired-degree', type=int, default=7)
+
+def add_query_arguments(parser):
+    """Adds the arguments of a single shortest path query."""
+    parser.add_argument('start', help='Name of the start city')
+    parser.add_argument('end', help='Name of the end city')
+    parser.add_argument('--algorithm', choices=['dijkstra', 'astar'], default='dijkstra')
+    parser.add_argument('--epsilon', type=float, default=1.0, help='Weight of the A* heuristic')
+    parser.add_argument('--queue', help='Priority queue from priority_queues instead of the default heapq loop')
+
+def load_graph(args):
+    """Loads the graph from the cache, building it first if an input changed."""
+    from graph_cache import load_or_build_graph
+    return load_or_build_graph(args.csv_file, args.min_population, args.desired_degree)
+
+def solve(cached_graph, args):
+    """Answers the query of the command line with the chosen algorithm."""
+    from sspp_solvers import astar, dijkstra
+    for city in (args.start, args.end):
+        if city not in cached_graph.graph:
+            raise ValueError(f"Unknown city: {city}")
+    if args.algorithm == 'astar':
+        return astar(cached_graph.graph, args.start, args.end, epsilon=args.epsilon, coords=cached_graph.coords, queue=args.queue)
+    return dijkstra(cached_graph.graph, args.start, args.end, queue=args.queue)
+
+def run_build(args):
+    """Builds the graph into the cache (or finds it there) and prints its size."""
+    cached_graph = load_graph(args)
+    print(f"{cached_graph.graph.num_nodes} cities, {cached_graph.graph.num_edges // 2} connections in {cached_graph.entry_dir}")
+
+def run_query(args):
+    """Answers one query on the cached graph and prints the result as JSON."""
+    cached_graph = load_graph(args)
+    path, total_weight, checked_nodes = solve(cached_graph, args)
+    print(json.dumps({'path': path or None, 'distance': total_weight if path else None, 'checked_nodes': len(checked_nodes)}))
+
+def run_bench(args):
+    """Runs the headless benchmark, all further arguments are passed on to it."""
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Evaluation'))
+    import benchmark
+    benchmark.main(args.bench_args)
+
+def run_plot(args):
+    """Answers one query and plots it, saved to --output without a window if it is given."""
+    cached_graph = load_graph(args)
+    path, _, checked_nodes = solve(cached_graph, args)
+    from plot import render_query
+    render_query(cached_graph.graph, cached_graph.coords, args.shapefile, path, checked_nodes,
+                 f'Cities in the US with more than {args.min_population} people', output_file=args.output)
+
+def parse_args(argv=None):
+    """Parses the subcommand and its arguments."""
+    parser = argparse.ArgumentParser(description='Build graphs and answer shortest path queries between US cities.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help='Build the graph into the cache')
+    add_graph_arguments(build_parser)
+    build_parser.set_defaults(run=run_build)
+
+    query_parser = subparsers.add_parser('query', help='Answer one query without plotting')
+    add_graph_arguments(query_parser)
+    add_query_arguments(query_parser)
+    query_parser.set_defaults(run=run_query)
+
+    # The benchmark parses its own arguments, they are collected as unknown arguments below
+    bench_parser = subparsers.add_parser('bench', help='Run the headless benchmark (Evaluation/benchmark.py), further arguments are passed on')
+    bench_parser.set_defaults(run=run_bench)
+
+    plot_parser = subparsers.add_parser('plot', help='Answer one query and plot it')
+    add_graph_arguments(plot_parser)
+    add_query_arguments(plot_parser)
+    plot_parser.add_argument('--shapefile', default='SHP/States_shapefile.shp')
+    plot_parser.add_argument('--output', help='Image file to save the plot to instead of showing it')
+    plot_parser.set_defaults(run=run_plot)
+
+    args, bench_args = parser.parse_known_args(argv)
+    if args.command != 'bench' and bench_args:
+        parser.error(f"unrecognized arguments: {' '.join(bench_args)}")
+    args.bench_args = bench_args
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        args.run(args)
+    except ValueError as error:
+        sys.exit(f"Error: {error}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+This module contains a Contraction Hierarchies (CH) preprocessing step and query engine for many point-to-point queries on the same graph.
+"""
+
+from heapq import heappop, heappush
+import numpy as np
+from csr_graph import NamedNodes, as_csr_graph
+
+class ContractionHierarchy(NamedNodes):
+    """Upward graph of a contraction hierarchy: every node keeps its edges to nodes that were contracted after it."""
+
+    def __init__(self, offsets, targets, weights, middles, rank, names):
+        self.offsets = offsets  # The upward edges of node i are stored at positions offsets[i]:offsets[i + 1]
+        self.targets = targets  # Higher ranked node of every upward edge, sorted within every node
+        self.weights = weights  # Weight of every upward edge in kilometers
+        self.middles = middles  # Contracted node a shortcut bypasses, -1 for original edges
+        self.rank = rank  # Position of every node in the contraction order
+        self.names = list(names)  # City name of every node id
+
+    def middle(self, a, b):
+        """Returns the node bypassed by the edge between a and b, -1 if it is an original edge."""
+        low, high = (a, b) if self.rank[a] < self.rank[b] else (b, a)
+        lo, hi = self.offsets[low], self.offsets[low + 1]
+        position = lo + int(np.searchsorted(self.targets[lo:hi], high))
+        return int(self.middles[position])
+
+    def unpack_edge(self, a, b):
+        """Replaces a (shortcut) edge by the original edges it stands for, returning the node ids from a to b."""
+        path = [a]
+        stack = [(a, b)]
+        while stack:
+            x, y = stack.pop()
+            middle = self.middle(x, y)
+            if middle < 0:
+                path.append(y)
+            else:
+                # Unpack the first half before the second half
+                stack.append((middle, y))
+                stack.append((x, middle))
+        return path
+
+    def query(self, start, end):
+        """Finds the shortest path with an upward search from both ends, returning the same tuple as dijkstra."""
+        start_id = self.node_id(start)
+        end_id = self.node_id(end)
+
+        # Index 0 holds the search from start, index 1 the search from end, both only follow upward edges
+        distances = [{start_id: 0.0}, {end_id: 0.0}]
+        previous_nodes = [{start_id: -1}, {end_id: -1}]
+        queues = [[(0.0, start_id)], [(0.0, end_id)]]
+        best_distance = float('inf')
+        meeting_node = -1
+        checked_nodes = []
+
+        while queues[0] or queues[1]:
+            # Expand the side with the smaller key
+            if not queues[1] or (queues[0] and queues[0][0][0] <= queues[1][0][0]):
+                side = 0
+            else:
+                side = 1
+            current_distance, current_node = heappop(queues[side])
+
+            # A side is done once its smallest key cannot improve the best path anymore
+            if current_distance >= best_distance:
+                queues[side] = []
+                continue
+            checked_nodes.append(current_node)
+
+            # If the current node's distance is greater than the stored distance, skip this node
+            if current_distance > distances[side][current_node]:
+                continue
+
+            # Check whether both searches meet in the current node
+            other_distance = distances[1 - side].get(current_node)
+            if other_distance is not None and current_distance + other_distance < best_distance:
+                best_distance = current_distance + other_distance
+                meeting_node = current_node
+
+            # Stall on demand: a higher ranked neighbor that already offers a shorter way here means no shortest path continues upward from this node
+            lo, hi = self.offsets[current_node], self.offsets[current_node + 1]
+            upward = list(zip(self.targets[lo:hi].tolist(), self.weights[lo:hi].tolist()))
+            if any(distances[side].get(neighbor, float('inf')) + weight < current_distance for neighbor, weight in upward):
+                continue
+
+            # Explore the upward edges of the current node
+            for neighbor, weight in upward:
+                distance = current_distance + weight
+                if distance < distances[side].get(neighbor, float('inf')):
+                    distances[side][neighbor] = distance
+                    previous_nodes[side][neighbor] = current_node
+                    heappush(queues[side], (distance, neighbor))
+
+        # If the end node is not reachable, return empty path and infinite distance
+        if meeting_node < 0:
+            return [], float('inf'), [self.names[i] for i in checked_nodes]
+
+        # Collect the upward paths from start and end to the meeting node
+        hierarchy_path = [meeting_node]
+        while previous_nodes[0][hierarchy_path[-1]] >= 0:
+            hierarchy_path.append(previous_nodes[0][hierarchy_path[-1]])
+        hierarchy_path.reverse()
+        while previous_nodes[1][hierarchy_path[-1]] >= 0:
+            hierarchy_path.append(previous_nodes[1][hierarchy_path[-1]])
+
+        # Unpack the shortcuts back into original edges
+        path = [start_id]
+        for a, b in zip(hierarchy_path, hierarchy_path[1:]):
+            path.extend(self.unpack_edge(a, b)[1:])
+        return [self.names[i] for i in path], best_distance, [self.names[i] for i in checked_nodes]
+
+    def save(self, file_path):
+        """Saves the hierarchy to a NumPy .npz file."""
+        np.savez(file_path, offsets=self.offsets, targets=self.targets, weights=self.weights, middles=self.middles, rank=self.rank, names=np.array(self.names))
+
+def load_contraction_hierarchy(file_path):
+    """Loads a hierarchy saved with ContractionHierarchy.save."""
+    with np.load(file_path, allow_pickle=False) as data:
+        return ContractionHierarchy(data['offsets'], data['targets'], data['weights'], data['middles'], data['rank'], data['names'].tolist())
+
+def witness_search(adjacency, source, skipped, targets, max_distance, settle_limit):
+    """Runs a limited Dijkstra from source that avoids the skipped node, returning the distances found up to max_distance."""
+    distances = {source: 0.0}
+    queue = [(0.0, source)]
+    remaining = set(targets)  # Targets whose distance is not final yet
+    settled = 0
+    while queue and remaining and settled < settle_limit:
+        distance, node = heappop(queue)
+        if distance > max_distance:
+            break
+        if distance > distances[node]:
+            continue
+        settled += 1
+        remaining.discard(node)
+        for neighbor, (weight, _) in adjacency[node].items():
+            if neighbor == skipped:
+                continue
+            candidate = distance + weight
+            if candidate < distances.get(neighbor, float('inf')):
+                distances[neighbor] = candidate
+                heappush(queue, (candidate, neighbor))
+    return distances
+
+def find_shortcuts(adjacency, node, settle_limit):
+    """Returns the shortcuts (u, w, weight) needed to keep all shortest paths through node once it is contracted."""
+    neighbors = list(adjacency[node].items())
+    shortcuts = []
+    for i, (u, (weight_u, _)) in enumerate(neighbors):
+        others = neighbors[i + 1:]
+        if not others:
+            continue
+
+        # A shortcut u-w is only needed if no path without node is as short as the path through it
+        max_distance = weight_u + max(weight for _, (weight, _) in others)
+        witnesses = witness_search(adjacency, u, node, [w for w, _ in others], max_distance, settle_limit)
+        for w, (weight_w, _) in others:
+            via_node = weight_u + weight_w
+            if witnesses.get(w, float('inf')) > via_node:
+                shortcuts.append((u, w, via_node))
+    return shortcuts
+
+def build_contraction_hierarchy(graph, settle_limit=100):
+    """Contracts the nodes of an undirected graph one by one, ordered by edge difference, and returns the ContractionHierarchy."""
+    graph = as_csr_graph(graph)
+    num_nodes = graph.num_nodes
+    offsets, targets, weights = graph.offsets.tolist(), graph.targets.tolist(), graph.weights.tolist()
+
+    # Remaining graph as {neighbor: (weight, middle node)} per node, contracted nodes are removed from it
+    adjacency = [{targets[j]: (weights[j], -1) for j in range(offsets[i], offsets[i + 1])} for i in range(num_nodes)]
+
+    contracted = [False] * num_nodes
+    contracted_neighbors = [0] * num_nodes
+
+    def priority(node):
+        # Edge difference plus the number of contracted neighbors to spread the contraction over the graph
+        shortcuts = find_shortcuts(adjacency, node, settle_limit)
+        return len(shortcuts) - len(adjacency[node]) + contracted_neighbors[node], shortcuts
+
+    queue = [(priority(node)[0], node) for node in range(num_nodes)]
+    queue.sort()
+
+    rank = np.zeros(num_nodes, dtype=np.int64)
+    upward_edges = [None] * num_nodes
+    order = 0
+    while queue:
+        _, node = heappop(queue)
+        if contracted[node]:
+            continue
+
+        # Lazy update: contract the node only if it is still the best after recomputing its priority
+        current_priority, shortcuts = priority(node)
+        if queue and current_priority > queue[0][0]:
+            heappush(queue, (current_priority, node))
+            continue
+
+        # All remaining neighbors are contracted later, so the current edges are the node's upward edges
+        rank[node] = order
+        order += 1
+        contracted[node] = True
+        upward_edges[node] = sorted((neighbor, weight, middle) for neighbor, (weight, middle) in adjacency[node].items())
+        for neighbor in adjacency[node]:
+            del adjacency[neighbor][node]
+            contracted_neighbors[neighbor] += 1
+        adjacency[node] = {}
+
+        # Add the shortcuts, an existing edge between the same nodes is replaced if the shortcut is shorter
+        for u, w, weight in shortcuts:
+            if weight < adjacency[u].get(w, (float('inf'), -1))[0]:
+                adjacency[u][w] = (weight, node)
+                adjacency[w][u] = (weight, node)
+
+    # Pack the upward edges into arrays
+    upward_offsets = np.zeros(num_nodes + 1, dtype=np.int64)
+    upward_offsets[1:] = np.cumsum([len(edges) for edges in upward_edges])
+    all_edges = [edge for edges in upward_edges for edge in edges]
+    upward_targets = np.array([edge[0] for edge in all_edges], dtype=np.int32)
+    upward_weights = np.array([edge[1] for edge in all_edges], dtype=np.float64)
+    upward_middles = np.array([edge[2] for edge in all_edges], dtype=np.int32)
+    return ContractionHierarchy(upward_offsets, upward_targets, upward_weights, upward_middles, rank, graph.names)
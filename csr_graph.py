@@ -0,0 +1,152 @@
+"""
+This module contains a compact array-backed graph representation in Compressed Sparse Row (CSR) format with integer node ids.
+"""
+
+import numpy as np
+
+class NamedNodes:
+    """Base class of tables indexed by node id, self.names holds the city name of every node id."""
+
+    @property
+    def index(self):
+        """Dictionary from city name to node id, built on first use."""
+        if getattr(self, '_index', None) is None:
+            self._index = {name: node_id for node_id, name in enumerate(self.names)}
+        return self._index
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, node):
+        return node in self.index
+
+    def node_id(self, node):
+        """Returns the integer node id of a city name, integer ids are passed through unchanged."""
+        if isinstance(node, (int, np.integer)):
+            return int(node)
+        return self.index[node]
+
+class FifoCache:
+    """Dictionary of at most max_size entries that forgets the oldest entry once it is full."""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._entries = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __getitem__(self, key):
+        return self._entries[key]
+
+    def __setitem__(self, key, value):
+        # Forget the oldest entry once the cache is full
+        if key not in self._entries and len(self._entries) >= self.max_size:
+            del self._entries[next(iter(self._entries))]
+        self._entries[key] = value
+
+    def get(self, key, default=None):
+        return self._entries.get(key, default)
+
+class CSRGraph(NamedNodes):
+    """Graph stored as NumPy offsets/targets/weights arrays plus a table mapping city names to integer node ids."""
+
+    def __init__(self, offsets, targets, weights, names):
+        self.offsets = offsets  # The neighbors of node i are stored at positions offsets[i]:offsets[i + 1]
+        self.targets = targets  # Node id of every edge's target, grouped by source node
+        self.weights = weights  # Weight of every edge in kilometers, parallel to targets
+        self.names = list(names)  # City name of every node id
+        self._index = None  # City name to node id, built on first use
+        self._neighbor_lists = None  # (target, weight) pairs of every node as Python lists, built on first use
+
+    @property
+    def neighbor_lists(self):
+        """List of (target id, weight) pairs per node id, faster than array slices in loops that visit one node at a time."""
+        if self._neighbor_lists is None:
+            offsets, targets, weights = self.offsets.tolist(), self.targets.tolist(), self.weights.tolist()
+            self._neighbor_lists = [list(zip(targets[offsets[i]:offsets[i + 1]], weights[offsets[i]:offsets[i + 1]])) for i in range(self.num_nodes)]
+        return self._neighbor_lists
+
+    @property
+    def num_nodes(self):
+        """Number of nodes in the graph."""
+        return len(self.names)
+
+    @property
+    def num_edges(self):
+        """Number of stored (directed) edges, every undirected connection counts twice."""
+        return len(self.targets)
+
+    def neighbors(self, node_id):
+        """Returns the target ids and weights of all edges leaving the given node id."""
+        lo, hi = self.offsets[node_id], self.offsets[node_id + 1]
+        return self.targets[lo:hi], self.weights[lo:hi]
+
+    def degree(self, node_id):
+        """Returns the number of edges leaving the given node id."""
+        return int(self.offsets[node_id + 1] - self.offsets[node_id])
+
+    def to_adjacency_list(self):
+        """Converts the graph back to the dict-of-dicts adjacency list keyed by city names."""
+        return csr_to_adjacency(self)
+
+def adjacency_to_csr(adj_list, names=None):
+    """Converts a dict-of-dicts adjacency list to a CSRGraph, node ids follow the order of names (default: dict order)."""
+    if names is None:
+        names = list(adj_list.keys())
+    index = {name: node_id for node_id, name in enumerate(names)}
+
+    # Count the edges of every node to get the offsets
+    offsets = np.zeros(len(names) + 1, dtype=np.int64)
+    for node_id, name in enumerate(names):
+        offsets[node_id + 1] = len(adj_list.get(name, {}))
+    np.cumsum(offsets, out=offsets)
+
+    # Fill the targets and weights, keeping the neighbor order of the adjacency list
+    targets = np.empty(offsets[-1], dtype=np.int32)
+    weights = np.empty(offsets[-1], dtype=np.float64)
+    for node_id, name in enumerate(names):
+        position = offsets[node_id]
+        for neighbor, weight in adj_list.get(name, {}).items():
+            targets[position] = index[neighbor]
+            weights[position] = weight
+            position += 1
+
+    return CSRGraph(offsets, targets, weights, names)
+
+def csr_to_adjacency(graph):
+    """Converts a CSRGraph to the dict-of-dicts adjacency list keyed by city names."""
+    names = graph.names
+    targets = graph.targets.tolist()
+    weights = graph.weights.tolist()
+    offsets = graph.offsets.tolist()
+
+    adj_list = {}
+    for node_id, name in enumerate(names):
+        lo, hi = offsets[node_id], offsets[node_id + 1]
+        adj_list[name] = {names[target]: weight for target, weight in zip(targets[lo:hi], weights[lo:hi])}
+    return adj_list
+
+def as_csr_graph(graph, names=None):
+    """Returns the graph as a CSRGraph, converting dict adjacency lists if necessary."""
+    if isinstance(graph, CSRGraph):
+        return graph
+    return adjacency_to_csr(graph, names)
+
+# Dict adjacency lists converted by cached_csr_graph, (id of the dict, id of the names) -> (dict, names, CSRGraph)
+_converted_graphs = FifoCache(4)
+
+def cached_csr_graph(graph, names=None):
+    """Like as_csr_graph, but a dict adjacency list is converted only once while the same dict (and names list) is passed."""
+    if isinstance(graph, CSRGraph):
+        return graph
+    # The entry keeps the dict and names, so their ids cannot be reused by other objects meanwhile
+    key = (id(graph), id(names))
+    cached = _converted_graphs.get(key)
+    if cached is None or cached[0] is not graph or cached[1] is not names:
+        cached = (graph, names, adjacency_to_csr(graph, names))
+        _converted_graphs[key] = cached
+    return cached[2]
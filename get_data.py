@@ -2,25 +2,127 @@
 This module is responsible for extracting city data from various sources and preparing it for analysis.
 """
 
-import pandas as pd
+import json
+import os
+import shutil
+import numpy as np
 
-def extract_city_data(csv_file, min_population):
-    """Extracts city data from a predefined source and returns it as a DataFrame."""
-    # Read CSV File
-    df = pd.read_csv(csv_file)
+# Exclude Cities from these states since they dont fit on the shp map
+EXCLUDED_STATES = ['Alaska', 'Hawaii', 'Puerto Rico', 'Guam', 'American Samoa', 'U.S. Virgin Islands', 'Northern Mariana Islands']
+
+# Only these columns are read from the csv, with compact types
+CITY_DTYPES = {'city': str, 'state_name': 'category', 'lat': np.float32, 'lng': np.float32, 'population': np.int64}
+
+# Increase when the cleaning of the city table changes, so old cached tables are rebuilt
+CITY_TABLE_VERSION = 1
+
+DEFAULT_CITY_CACHE_DIR = '.city_cache'
+
+# Tables already loaded by this process, keyed by their cache inputs
+_city_tables = {}
 
-    # Extract important Columns 
-    columns_of_interest = ['city', 'state_name', 'lat', 'lng', 'population']
-    df = df[columns_of_interest]
+def read_city_table(csv_file, excluded_states=EXCLUDED_STATES):
+    """Reads the cleaned city table from the csv, sorted by descending population."""
+    # pandas is only imported when city data is read, so EXCLUDED_STATES can be imported without it
+    import pandas as pd
+
+    # Read only the important Columns
+    df = pd.read_csv(csv_file, usecols=list(CITY_DTYPES), dtype=CITY_DTYPES)
 
     # Drop dublicate Cities
     df = df.drop_duplicates(subset=['city'])
 
-    # Filter all Cities that have a population more than min_population
-    df = df[df['population'] >= min_population]
-
-    # Exclude Cities from these states since they dont fit on the shp map 
-    excluded_states = ['Alaska', 'Hawaii', 'Puerto Rico', 'Guam', 'American Samoa', 'U.S. Virgin Islands', 'Northern Mariana Islands']
+    # Exclude Cities from states that dont fit on the shp map
     df = df[~df['state_name'].isin(excluded_states)]
 
-    return df
\ No newline at end of file
+    # Every population threshold is a prefix of the sorted table, ties keep the order of the csv
+    df = df.sort_values('population', ascending=False, kind='stable')
+    return df[list(CITY_DTYPES)].reset_index(drop=True)
+
+def city_table_inputs(csv_file, excluded_states=EXCLUDED_STATES):
+    """Returns everything the cached table depends on, the csv is identified by its size and modification time."""
+    status = os.stat(csv_file)
+    return {
+        'version': CITY_TABLE_VERSION,
+        'csv_file': os.path.abspath(csv_file),
+        'csv_size': status.st_size,
+        'csv_mtime_ns': status.st_mtime_ns,
+        'excluded_states': sorted(excluded_states),
+    }
+
+def save_city_table(table_dir, df, inputs):
+    """Writes every column of the table to its own .npy file, the directory only appears once it is complete."""
+    temp_dir = f'{table_dir}.tmp{os.getpid()}'
+    os.makedirs(temp_dir, exist_ok=True)
+    columns = {
+        'city': df['city'].to_numpy(dtype=str),
+        'state_codes': df['state_name'].cat.codes.to_numpy(),
+        'state_categories': df['state_name'].cat.categories.to_numpy(dtype=str),
+        'lat': df['lat'].to_numpy(),
+        'lng': df['lng'].to_numpy(),
+        'population': df['population'].to_numpy(),
+    }
+    for name, column in columns.items():
+        np.save(os.path.join(temp_dir, f'{name}.npy'), column)
+    with open(os.path.join(temp_dir, 'inputs.json'), 'w') as file:
+        json.dump(inputs, file, indent=2)
+
+    # Another process may have stored a table from the same inputs meanwhile, it is kept and the new one discarded
+    if stored_inputs(table_dir) != inputs:
+        shutil.rmtree(table_dir, ignore_errors=True)
+        try:
+            os.replace(temp_dir, table_dir)
+            return
+        except OSError:
+            if stored_inputs(table_dir) != inputs:
+                raise
+    shutil.rmtree(temp_dir, ignore_errors=True)
+
+def stored_inputs(table_dir):
+    """Returns the inputs a cached table was built from, or None if there is no complete table."""
+    inputs_file = os.path.join(table_dir, 'inputs.json')
+    if not os.path.isfile(inputs_file):
+        return None
+    with open(inputs_file) as file:
+        return json.load(file)
+
+def load_city_table(table_dir):
+    """Loads a cached table, the numeric columns are memory-mapped instead of read."""
+    import pandas as pd
+
+    def load(name):
+        return np.load(os.path.join(table_dir, f'{name}.npy'), mmap_mode='r')
+
+    state_name = pd.Categorical.from_codes(load('state_codes'), load('state_categories'))
+    return pd.DataFrame({
+        'city': load('city').astype(object),
+        'state_name': state_name,
+        'lat': load('lat'),
+        'lng': load('lng'),
+        'population': load('population'),
+    }, copy=False)
+
+def city_table(csv_file, excluded_states=EXCLUDED_STATES, cache_dir=DEFAULT_CITY_CACHE_DIR):
+    """Returns the cleaned city table, read from the cache and only rebuilt from the csv when it changed."""
+    inputs = city_table_inputs(csv_file, excluded_states)
+    key = json.dumps(inputs, sort_keys=True)
+    if key in _city_tables:
+        return _city_tables[key]
+
+    # One table per csv file, replaced when the file or the excluded states change
+    table_dir = os.path.join(cache_dir, os.path.splitext(os.path.basename(csv_file))[0])
+    if stored_inputs(table_dir) != inputs:
+        os.makedirs(cache_dir, exist_ok=True)
+        save_city_table(table_dir, read_city_table(csv_file, excluded_states), inputs)
+
+    _city_tables[key] = load_city_table(table_dir)
+    return _city_tables[key]
+
+def extract_city_data(csv_file, min_population, excluded_states=EXCLUDED_STATES, cache_dir=DEFAULT_CITY_CACHE_DIR):
+    """Extracts city data from a predefined source and returns it as a DataFrame."""
+    df = city_table(csv_file, excluded_states, cache_dir)
+
+    # Filter all Cities that have a population more than min_population, the table is sorted so they are a slice of it
+    population = df['population'].to_numpy()
+    count = len(population) - np.searchsorted(population[::-1], min_population, side='left')
+    return df.iloc[:count]
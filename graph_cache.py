@@ -0,0 +1,135 @@
+"""
+This module contains a persistent on-disk cache for generated graphs, keyed by the city data and the build parameters.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import numpy as np
+from csr_graph import CSRGraph
+from get_data import EXCLUDED_STATES
+from make_graph import CoordinateIndex
+
+# Increase when the stored format or the graph generation changes, so old entries are rebuilt
+CACHE_FORMAT_VERSION = 2
+
+DEFAULT_CACHE_DIR = '.graph_cache'
+
+# Arrays stored per cache entry, every one in its own memory-mappable .npy file
+GRAPH_ARRAYS = ['offsets', 'targets', 'weights']
+CITY_ARRAYS = ['city', 'state_name', 'lat', 'lng', 'population']
+
+class CachedGraph:
+    """A graph loaded from the cache, its arrays are memory-mapped and only read from disk when used."""
+
+    def __init__(self, entry_dir):
+        self.entry_dir = entry_dir
+        self._graph = None
+        self._coords = None
+
+    def load_array(self, name):
+        """Memory-maps one stored array."""
+        return np.load(os.path.join(self.entry_dir, f'{name}.npy'), mmap_mode='r')
+
+    @property
+    def names(self):
+        """City name of every node id."""
+        return self.graph.names
+
+    @property
+    def graph(self):
+        """The graph as a CSRGraph on top of the memory-mapped arrays."""
+        if self._graph is None:
+            offsets, targets, weights = (self.load_array(name) for name in GRAPH_ARRAYS)
+            self._graph = CSRGraph(offsets, targets, weights, self.load_array('city').tolist())
+        return self._graph
+
+    @property
+    def coords(self):
+        """The CoordinateIndex for the A* heuristic."""
+        if self._coords is None:
+            self._coords = CoordinateIndex(self.names, self.load_array('lat'), self.load_array('lng'))
+        return self._coords
+
+    def city_data(self):
+        """Returns the city table as the DataFrame extract_city_data would return."""
+        import pandas as pd
+        return pd.DataFrame({name: self.load_array(name) for name in CITY_ARRAYS})
+
+def file_digest(file_path):
+    """Returns the SHA-256 hex digest of a file's content."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def cache_inputs(csv_file, min_population, desired_degree, excluded_states=EXCLUDED_STATES):
+    """Returns everything the graph depends on, the cache key is the hash of it."""
+    return {
+        'csv_file': os.path.abspath(csv_file),
+        'csv_sha256': file_digest(csv_file),
+        'min_population': min_population,
+        'excluded_states': sorted(excluded_states),
+        'desired_degree': desired_degree,
+        'format_version': CACHE_FORMAT_VERSION,
+    }
+
+def cache_key(inputs):
+    """Hashes the cache inputs, the CSV path itself is not part of the key so moved files still hit the cache."""
+    keyed = {key: value for key, value in inputs.items() if key != 'csv_file'}
+    return hashlib.sha256(json.dumps(keyed, sort_keys=True).encode()).hexdigest()[:32]
+
+def save_graph(entry_dir, graph, city_data_df, inputs):
+    """Writes the graph arrays and the city table of one cache entry, the entry only appears once it is complete."""
+    temp_dir = f'{entry_dir}.tmp{os.getpid()}'
+    os.makedirs(temp_dir, exist_ok=True)
+    arrays = {'offsets': graph.offsets, 'targets': graph.targets, 'weights': graph.weights}
+    arrays['city'] = np.array(graph.names, dtype=str)
+    arrays['state_name'] = city_data_df['state_name'].to_numpy(dtype=str)
+    arrays['lat'] = city_data_df['lat'].to_numpy(dtype=np.float64)
+    arrays['lng'] = city_data_df['lng'].to_numpy(dtype=np.float64)
+    arrays['population'] = city_data_df['population'].to_numpy()
+    for name, array in arrays.items():
+        np.save(os.path.join(temp_dir, f'{name}.npy'), np.ascontiguousarray(array))
+    with open(os.path.join(temp_dir, 'inputs.json'), 'w') as file:
+        json.dump(inputs, file, indent=2)
+    try:
+        os.replace(temp_dir, entry_dir)
+    except OSError:
+        # Another process stored the same entry meanwhile, the key covers all inputs so its entry is used instead
+        if not os.path.isdir(entry_dir):
+            raise
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+def remove_outdated_entries(cache_dir, inputs, key):
+    """Deletes entries that were built for the same CSV file, parameters and excluded states but from older data."""
+    for entry in os.listdir(cache_dir):
+        inputs_file = os.path.join(cache_dir, entry, 'inputs.json')
+        if entry == key or not os.path.isfile(inputs_file):
+            continue
+        with open(inputs_file) as file:
+            entry_inputs = json.load(file)
+        same_parameters = all(entry_inputs.get(name) == inputs[name] for name in ('csv_file', 'min_population', 'desired_degree', 'excluded_states'))
+        if same_parameters:
+            shutil.rmtree(os.path.join(cache_dir, entry), ignore_errors=True)
+
+def load_or_build_graph(csv_file, min_population, desired_degree, excluded_states=EXCLUDED_STATES, cache_dir=DEFAULT_CACHE_DIR):
+    """Returns the CachedGraph for these inputs, building and storing it first if it is not in the cache."""
+    inputs = cache_inputs(csv_file, min_population, desired_degree, excluded_states)
+    key = cache_key(inputs)
+    entry_dir = os.path.join(cache_dir, key)
+
+    if not os.path.isdir(entry_dir):
+        # Import the builders only when the graph really has to be built
+        from get_data import extract_city_data
+        from make_graph import generate_random_graph
+
+        city_data_df = extract_city_data(csv_file, min_population, excluded_states)
+        graph = generate_random_graph(city_data_df, desired_degree, as_csr=True)
+        os.makedirs(cache_dir, exist_ok=True)
+        remove_outdated_entries(cache_dir, inputs, key)
+        save_graph(entry_dir, graph, city_data_df, inputs)
+
+    return CachedGraph(entry_dir)
@@ -0,0 +1,145 @@
+"""
+This module contains an incremental planner (Lifelong Planning A*) that repairs its last search after edge weight changes instead of starting over.
+"""
+
+from heapq import heappop, heappush
+import numpy as np
+from csr_graph import CSRGraph, as_csr_graph
+from sspp_solvers import align_heuristic, select_heuristic
+
+class IncrementalPlanner:
+    """LPA* between a fixed start and end city on its own copy of the edge weights."""
+
+    def __init__(self, graph, start, end, cities_df=None, coords=None, heuristic=None):
+        coords = select_heuristic(cities_df, coords, heuristic)
+        graph = as_csr_graph(graph, coords.names)
+        coords = align_heuristic(graph, coords)
+
+        # The weights are copied, so changes never touch the graph that was passed in
+        self.graph = CSRGraph(graph.offsets, graph.targets, np.array(graph.weights, dtype=np.float64), graph.names)
+        self.start_id = self.graph.node_id(start)
+        self.end_id = self.graph.node_id(end)
+
+        # The heuristic of every node is looked up once, LPA* needs it for every key
+        self.h = np.asarray(coords.estimate(np.arange(self.graph.num_nodes), self.end_id), dtype=np.float64)
+
+        # g is the distance found by the last expansion, rhs the one-step lookahead from the neighbors' g values
+        self.g = np.full(self.graph.num_nodes, np.inf)
+        self.rhs = np.full(self.graph.num_nodes, np.inf)
+        self.rhs[self.start_id] = 0
+        self.open_list = [self.calculate_key(self.start_id) + (self.start_id,)]
+
+    def calculate_key(self, node):
+        """Returns the priority of a node, ties are broken by the smaller distance."""
+        k = min(self.g[node], self.rhs[node])
+        return (float(k + self.h[node]), float(k))
+
+    def edge_positions(self, a, b):
+        """Returns the positions of the edges a -> b and b -> a in the weight array."""
+        positions = []
+        for u, v in ((a, b), (b, a)):
+            lo, hi = self.graph.offsets[u], self.graph.offsets[u + 1]
+            match = np.flatnonzero(self.graph.targets[lo:hi] == v)
+            if len(match) == 0:
+                raise KeyError(f"No connection between {self.graph.names[a]} and {self.graph.names[b]}")
+            positions.append(lo + match[0])
+        return positions
+
+    def edge_weight(self, city_a, city_b):
+        """Returns the current weight of the connection between two cities."""
+        a, b = self.graph.node_id(city_a), self.graph.node_id(city_b)
+        return float(self.graph.weights[self.edge_positions(a, b)[0]])
+
+    def update_vertex(self, node):
+        """Recomputes rhs of a node from its neighbors and queues it if it became inconsistent."""
+        if node != self.start_id:
+            neighbors, weights = self.graph.neighbors(node)
+            self.rhs[node] = (self.g[neighbors] + weights).min() if len(neighbors) > 0 else np.inf
+        if self.g[node] != self.rhs[node]:
+            heappush(self.open_list, self.calculate_key(node) + (node,))
+
+    def update_edges(self, changes):
+        """Sets new weights for a batch of (city_a, city_b, weight) connections, use inf to close a connection."""
+        # The whole batch is checked first, so a bad change leaves every weight untouched
+        updates = []
+        for city_a, city_b, weight in changes:
+            a, b = self.graph.node_id(city_a), self.graph.node_id(city_b)
+
+            # LPA* only repairs correctly while the heuristic stays consistent on every edge (up to rounding)
+            if abs(self.h[a] - self.h[b]) > weight * (1 + 1e-9):
+                raise ValueError(f"Weight {weight} between {city_a} and {city_b} is shorter than the heuristic allows")
+            updates.append((a, b, self.edge_positions(a, b), weight))
+
+        # Connections are undirected, both directions get the new weight
+        changed_nodes = set()
+        for a, b, positions, weight in updates:
+            self.graph.weights[positions] = weight
+            changed_nodes.update((a, b))
+
+        # Only the endpoints of changed edges can get a different rhs
+        for node in changed_nodes:
+            self.update_vertex(node)
+
+    def compute_shortest_path(self):
+        """Expands inconsistent nodes until the end node is consistent and returns the expanded node ids."""
+        g, rhs, h = self.g, self.rhs, self.h
+        open_list = self.open_list
+        end_id = self.end_id
+        checked_nodes = []
+
+        # Nodes whose key only exceeds the end node's by rounding (g + h summed in another order) are still expanded
+        while open_list and (open_list[0][0] <= self.calculate_key(end_id)[0] * (1 + 1e-9) or rhs[end_id] != g[end_id]):
+            k1, k2, current = heappop(open_list)
+
+            # Entries of nodes that became consistent or got a new key in the meantime are outdated
+            if g[current] == rhs[current]:
+                continue
+            key = self.calculate_key(current)
+            if (k1, k2) < key:
+                heappush(open_list, key + (current,))
+                continue
+            checked_nodes.append(current)
+
+            neighbors, weights = self.graph.neighbors(current)
+            if g[current] > rhs[current]:
+                # Overconsistent: the node's distance shrank, settle it and relax the whole neighbor block at once
+                g[current] = rhs[current]
+                tentative = g[current] + weights
+                improved = tentative < rhs[neighbors]
+                neighbors = neighbors[improved]
+                rhs[neighbors] = tentative[improved]
+                for neighbor in neighbors.tolist():
+                    if g[neighbor] != rhs[neighbor]:
+                        k = min(g[neighbor], rhs[neighbor])
+                        heappush(open_list, (float(k + h[neighbor]), float(k), neighbor))
+            else:
+                # Underconsistent: the node's distance grew, reset it and recompute everything that may have used it
+                g[current] = np.inf
+                self.update_vertex(current)
+                for neighbor in neighbors.tolist():
+                    self.update_vertex(neighbor)
+
+        return checked_nodes
+
+    def trace_path(self):
+        """Follows the neighbors with the smallest g + weight from the end back to the start."""
+        path = [self.end_id]
+        current = self.end_id
+        while current != self.start_id:
+            neighbors, weights = self.graph.neighbors(current)
+            current = int(neighbors[np.argmin(self.g[neighbors] + weights)])
+            path.append(current)
+        path.reverse()
+        return path
+
+    def search(self):
+        """Brings the search up to date and returns the path, its total weight and the nodes expanded by this call."""
+        names = self.graph.names
+        checked_nodes = [names[i] for i in self.compute_shortest_path()]
+
+        # If the end node is not reachable, return None and infinite weight like astar
+        if self.g[self.end_id] == np.inf:
+            return None, float('inf'), checked_nodes
+
+        path = self.trace_path()
+        return [names[i] for i in path], float(self.g[self.end_id]), checked_nodes
@@ -0,0 +1,99 @@
+"""
+This module contains the ALT (A*, Landmarks, Triangle inequality) heuristic, a pluggable alternative to the Haversine heuristic for A*.
+"""
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra as csgraph_dijkstra
+from csr_graph import NamedNodes, as_csr_graph
+
+class LandmarkHeuristic(NamedNodes):
+    """Lower bounds from precomputed landmark distances: |d(L, target) - d(L, v)| for every landmark L, maximized."""
+
+    def __init__(self, landmarks, distances, names):
+        self.landmarks = list(landmarks)  # Node ids of the landmarks
+        self.distances = distances  # Shortest path distance from every landmark (rows) to every node (columns)
+        self.names = list(names)  # City name of every node id
+
+    def estimate(self, node_ids, target_id):
+        """Returns the landmark lower bound from every given node id to the target."""
+        bounds = np.abs(self.distances[:, target_id, None] - self.distances[:, node_ids])
+        # Nodes a landmark cannot reach give no bound (inf - inf)
+        bounds[np.isnan(bounds)] = 0
+        return bounds.max(axis=0)
+
+class MaxHeuristic:
+    """Combines several admissible heuristics by taking the largest estimate, which is still admissible."""
+
+    def __init__(self, *heuristics):
+        self.heuristics = heuristics
+        self.names = heuristics[0].names  # All heuristics must use the same node ids
+        self.index = heuristics[0].index
+
+    def __len__(self):
+        return len(self.names)
+
+    def estimate(self, node_ids, target_id):
+        """Returns the largest estimate of all heuristics for every given node id."""
+        estimates = self.heuristics[0].estimate(node_ids, target_id)
+        for heuristic in self.heuristics[1:]:
+            estimates = np.maximum(estimates, heuristic.estimate(node_ids, target_id))
+        return estimates
+
+def graph_distances(graph, sources):
+    """Computes the shortest path distances from every source node id to all nodes (one row per source)."""
+    matrix = csr_matrix((graph.weights, graph.targets, graph.offsets), shape=(graph.num_nodes, graph.num_nodes))
+    return csgraph_dijkstra(matrix, indices=sources)
+
+def select_farthest_landmarks(graph, count):
+    """Selects landmarks one by one, each one as far as possible (in graph distance) from the ones chosen so far."""
+    # Start with the node farthest from the first node
+    first_distances = graph_distances(graph, [0])[0]
+    first_distances[np.isinf(first_distances)] = -1
+    landmarks = [int(np.argmax(first_distances))]
+    rows = [graph_distances(graph, landmarks)[0]]
+    min_distances = rows[0].copy()
+
+    while len(landmarks) < min(count, graph.num_nodes):
+        # Unreachable nodes are not useful as landmarks
+        candidates = np.where(np.isinf(min_distances), -1, min_distances)
+        candidates[landmarks] = -1
+        landmark = int(np.argmax(candidates))
+        landmarks.append(landmark)
+        rows.append(graph_distances(graph, [landmark])[0])
+        min_distances = np.minimum(min_distances, rows[-1])
+
+    return landmarks, np.vstack(rows)
+
+def select_region_landmarks(graph, count, coords):
+    """Splits the map into count angular sectors around the center and selects the node farthest from the center in each."""
+    # The coordinates may order the cities differently, they are looked up by the city names of the graph
+    missing = [name for name in graph.names if name not in coords.index]
+    if missing:
+        raise ValueError(f"The coordinates have no entry for city: {missing[0]}")
+    order = np.array([coords.index[name] for name in graph.names], dtype=np.int64)
+    lat, lng = coords.lat[order], coords.lng[order]
+
+    center_lat = lat.mean()
+    center_lng = lng.mean()
+    angles = np.arctan2(lat - center_lat, (lng - center_lng) * np.cos(center_lat))
+    radii = np.hypot(lat - center_lat, (lng - center_lng) * np.cos(center_lat))
+    sectors = np.minimum(((angles + np.pi) / (2 * np.pi) * count).astype(np.int64), count - 1)
+
+    landmarks = []
+    for sector in range(count):
+        members = np.flatnonzero(sectors == sector)
+        if len(members):
+            landmarks.append(int(members[np.argmax(radii[members])]))
+    return landmarks, graph_distances(graph, landmarks)
+
+def build_landmark_heuristic(graph, count=8, method='farthest', coords=None):
+    """Selects landmarks ('farthest' or 'region', which needs a CoordinateIndex) and precomputes their distances."""
+    graph = as_csr_graph(graph, coords.names if coords is not None else None)
+    if method == 'farthest':
+        landmarks, distances = select_farthest_landmarks(graph, count)
+    elif method == 'region':
+        landmarks, distances = select_region_landmarks(graph, count, coords)
+    else:
+        raise ValueError(f"Unknown landmark selection method: {method}")
+    return LandmarkHeuristic(landmarks, distances, graph.names)
@@ -2,9 +2,9 @@
 This is the main entry point for the program. Main function to test and plot the Dijkstra and A* algorithms on a graph generated from city data.
 """
 
-from get_data import extract_city_data
-from make_graph import generate_random_graph
-from plot import plot_cities_with_connections
+from graph_cache import load_or_build_graph
+from plot import render_query
+from search_stats import SearchStats
 from sspp_solvers import astar, dijkstra
 
 def main():
@@ -18,39 +18,45 @@ def main():
     # How many degrees are desired for every node
     desired_degree = 7
 
-    # Get City Name, Population and Location from csv File
-    city_data_df = extract_city_data(csv_file, min_population)
+    # Load the Graph with all connections from the cache, it is only built from the csv File when an input changed
+    cached_graph = load_or_build_graph(csv_file, min_population, desired_degree)
+
+    # Get City Name, Population and Location of the cached Graph
+    city_data_df = cached_graph.city_data()
     print(city_data_df.head())
 
     print(f"Total cities with a population above {min_population} in the metro area: {len(city_data_df)}")
 
-    # Generate the Graph with all connections
-    adj_list = generate_random_graph(city_data_df, desired_degree)
+    title = f'Cities in the US with more than {min_population} people'
 
     # Start- and Endpoint of the Single Shortest Path problem
     start = 'Miami'
     end = 'Seattle'
     #########################################################################
     # Calculate the shortest path with the Dijkstra Algorithm
-    path, total_weight, checked_nodes = dijkstra(adj_list, start, end)
+    stats = SearchStats()
+    path, total_weight, checked_nodes = dijkstra(cached_graph.graph, start, end, stats=stats)
 
     print("Shortest path:", path)
     print("Total weight:", total_weight)
     print("Checked nodes:", checked_nodes)
+    print("Search statistics:", stats)
 
     # Plot the result of the Dijkstra Algorithm
-    plot_cities_with_connections(city_data_df, adj_list, shapefile_path, path, checked_nodes, min_population)
+    render_query(cached_graph.graph, cached_graph.coords, shapefile_path, path, checked_nodes, title, stats)
 
     ######################################################################
     # Calculate the shortest path with the Astar Algorithm
-    path, total_weight, checked_nodes = astar(adj_list, start, end, city_data_df, epsilon=2)
+    stats = SearchStats()
+    path, total_weight, checked_nodes = astar(cached_graph.graph, start, end, epsilon=2, coords=cached_graph.coords, stats=stats)
 
     print("Shortest path:", path)
     print("Total weight:", total_weight)
     print("Checked nodes:", checked_nodes)
+    print("Search statistics:", stats)
 
     # Plot the result of the A* Algorithm
-    plot_cities_with_connections(city_data_df, adj_list, shapefile_path, path, checked_nodes, min_population)
+    render_query(cached_graph.graph, cached_graph.coords, shapefile_path, path, checked_nodes, title, stats)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
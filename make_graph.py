@@ -4,7 +4,8 @@ This module contains functions for generating and manipulating graphs based on c
 
 import heapq
 from math import radians, sin, cos, sqrt, atan2
-import pandas as pd
+import numpy as np
+from csr_graph import FifoCache, NamedNodes, adjacency_to_csr
 
 def haversine(lat1, lon1, lat2, lon2):
     """Calculate the Haversine distance between two points on the Earth's surface."""
@@ -15,30 +16,162 @@ def haversine(lat1, lon1, lat2, lon2):
     c = 2 * atan2(sqrt(a), sqrt(1 - a))  # Angular distance in radians
     return R * c  # Distance in kilometers
 
+def haversine_vectorized(lat1, lon1, lat2, lon2):
+    """Calculate the Haversine distance for whole arrays of points at once, all coordinates given in radians."""
+    R = 6371.0  # Earth radius in kilometers
+    dlat = lat2 - lat1  # Difference in latitude in radians
+    dlon = lon2 - lon1  # Difference in longitude in radians
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2  # Haversine formula
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))  # Angular distance in radians
+    return R * c  # Distance in kilometers
+
+class CoordinateIndex(NamedNodes):
+    """Radian latitude/longitude arrays indexed by node id, with the Haversine heuristic memoized per target."""
+
+    def __init__(self, names, lats, lngs, max_cached_targets=16):
+        self.names = list(names)  # City name of every node id
+        self.lat = np.radians(np.asarray(lats, dtype=np.float64))  # Latitude of every node id in radians
+        self.lng = np.radians(np.asarray(lngs, dtype=np.float64))  # Longitude of every node id in radians
+        self._memo = FifoCache(max_cached_targets)  # Target node id -> heuristic values of all nodes (NaN until computed)
+
+    @classmethod
+    def from_radians(cls, names, lat, lng, max_cached_targets=16):
+        """Wraps existing radian latitude/longitude arrays (for example in shared memory) without copying them."""
+        coords = cls(names, [], [], max_cached_targets)
+        coords.lat = lat
+        coords.lng = lng
+        return coords
+
+    def estimate(self, node_ids, target_id):
+        """Returns the Haversine distance from every given node id to the target, each value is computed once per target."""
+        memo = self._memo.get(target_id)
+        if memo is None:
+            memo = np.full(len(self.names), np.nan)
+            self._memo[target_id] = memo
+
+        # Compute only the values that were not needed before, in one vectorized call
+        values = memo[node_ids]
+        missing = np.isnan(values)
+        if missing.any():
+            missing_ids = node_ids[missing]
+            values[missing] = haversine_vectorized(self.lat[missing_ids], self.lng[missing_ids], self.lat[target_id], self.lng[target_id])
+            memo[missing_ids] = values[missing]
+        return values
+
+def build_coordinate_index(city_data_df):
+    """Build a CoordinateIndex with node ids in the order of the DataFrame rows."""
+    return CoordinateIndex(city_data_df['city'], city_data_df['lat'], city_data_df['lng'])
+
+def unit_sphere_coordinates(lats, lngs):
+    """Convert latitudes and longitudes in degrees to 3D points on the unit sphere."""
+    lat = np.radians(np.asarray(lats, dtype=np.float64))
+    lng = np.radians(np.asarray(lngs, dtype=np.float64))
+    cos_lat = np.cos(lat)
+    # The straight-line (chord) distance between these points grows monotonically with the Haversine distance
+    return np.column_stack((cos_lat * np.cos(lng), cos_lat * np.sin(lng), np.sin(lat)))
+
+def mst_candidate_edges(points, k=8):
+    """Return candidate edges (pairs of city indices) that contain every edge of the Minimum Spanning Tree."""
+    # scipy is only imported when a graph is built, the solvers import this module for the heuristic alone
+    from scipy.spatial import ConvexHull, cKDTree
+    num_cities = len(points)
+
+    # For points on a sphere, the convex hull is the spherical Delaunay triangulation, which contains the MST
+    hull = ConvexHull(points)
+    simplices = hull.simplices
+    edges = [simplices[:, [0, 1]], simplices[:, [1, 2]], simplices[:, [0, 2]]]
+
+    # Duplicate or numerically coplanar cities are no hull vertices, connect them to their nearest neighbors instead
+    on_hull = np.zeros(num_cities, dtype=bool)
+    on_hull[hull.vertices] = True
+    skipped = np.flatnonzero(~on_hull)
+    if len(skipped):
+        _, nearest = cKDTree(points).query(points[skipped], k=min(k + 1, num_cities))
+        nearest = nearest.reshape(len(skipped), -1)
+        edges.append(np.column_stack((np.repeat(skipped, nearest.shape[1]), nearest.ravel())))
+        # The nearest hull vertex keeps every skipped city connected to the rest of the graph
+        hull_vertices = np.flatnonzero(on_hull)
+        _, nearest_vertex = cKDTree(points[hull_vertices]).query(points[skipped], k=1)
+        edges.append(np.column_stack((skipped, hull_vertices[nearest_vertex])))
+
+    # Remove self loops and duplicate edges
+    edges = np.sort(np.concatenate(edges), axis=1)
+    edges = edges[edges[:, 0] != edges[:, 1]]
+    return np.unique(edges, axis=0)
+
+def dense_prim_mst(cities, points):
+    """Generate the MST with Prim's algorithm on the complete graph, keeping only one best distance per city (O(n) memory)."""
+    num_cities = len(cities)
+    edges = []  # List to store the edges of the MST
+    in_mst = np.zeros(num_cities, dtype=bool)  # Boolean array to track if a city is included in the MST
+    best_dist = np.full(num_cities, np.inf)  # Smallest squared chord distance from every city to the MST
+    best_from = np.zeros(num_cities, dtype=np.int64)  # MST city that distance belongs to
+
+    # Start from the first city
+    current = 0
+    in_mst[current] = True
+    best_dist[current] = np.inf
+    for _ in range(num_cities - 1):
+        # Update the best distances with the city that was just added, equal distances keep the smaller city index like the heap
+        dist = ((points - points[current]) ** 2).sum(axis=1)
+        closer = ((dist < best_dist) | ((dist == best_dist) & (current < best_from))) & ~in_mst
+        best_dist[closer] = dist[closer]
+        best_from[closer] = current
+
+        # Add the closest city outside the MST
+        to = int(np.argmin(best_dist))
+        frm = int(best_from[to])
+        in_mst[to] = True
+        best_dist[to] = np.inf
+        edges.append((frm, to, haversine(cities[frm][1], cities[frm][2], cities[to][1], cities[to][2])))
+        current = to
+    return edges
+
 # Generate Minimum Spanning Tree (MST) using Prim's Algorithm
 def generate_mst(cities):
     """Generate a Minimum Spanning Tree (MST) using Prim's algorithm."""
+    from scipy.spatial import QhullError
     num_cities = len(cities)  # Number of cities
+    points = unit_sphere_coordinates([city[1] for city in cities], [city[2] for city in cities])
+
+    # Build the MST on the sparse Delaunay candidate graph
+    try:
+        if num_cities < 4:
+            raise QhullError('Too few cities for a convex hull')
+        candidates = mst_candidate_edges(points)
+    except QhullError:
+        return dense_prim_mst(cities, points)
+
+    # Replay Prim's algorithm from the first city on the candidate edges with the heap order of the full search,
+    # (distance, to, from), so equal distances are broken the same way. Every edge Prim can pick (a shortest edge
+    # leaving the tree, including all tied ones) lies in the Delaunay candidate graph.
+    candidate_neighbors = [[] for _ in range(num_cities)]
+    for u, v in candidates.tolist():
+        candidate_neighbors[u].append(v)
+        candidate_neighbors[v].append(u)
+
     edges = []  # List to store the edges of the MST
     in_mst = [False] * num_cities  # Boolean array to track if a city is included in the MST
     min_edge = []  # Min-heap to get the edge with the smallest weight
-
-    # Start from the first city
     in_mst[0] = True
-    for i in range(1, num_cities):
-        dist = haversine(cities[0][1], cities[0][2], cities[i][1], cities[i][2])
-        heapq.heappush(min_edge, (dist, i, 0))
+    for i in candidate_neighbors[0]:
+        heapq.heappush(min_edge, (haversine(cities[0][1], cities[0][2], cities[i][1], cities[i][2]), i, 0))
 
-    # While the MST does not include all cities
-    while len(edges) < num_cities - 1:
+    # Only candidate edges enter the heap, so it never holds more than their number of entries
+    while min_edge:
         weight, to, frm = heapq.heappop(min_edge)  # Get the edge with the smallest weight
-        if not in_mst[to]:  # If the target city is not in the MST
-            in_mst[to] = True  # Include the target city in the MST
-            edges.append((frm, to, weight))  # Add the edge to the MST
-            for next_to in range(num_cities):
-                if not in_mst[next_to]:  # If the next city is not in the MST
-                    dist = haversine(cities[to][1], cities[to][2], cities[next_to][1], cities[next_to][2])
-                    heapq.heappush(min_edge, (dist, next_to, to))  # Add the edge to the min-heap
+        if in_mst[to]:
+            continue
+        in_mst[to] = True  # Include the target city in the MST
+        edges.append((frm, to, weight))  # Add the edge to the MST
+        for next_to in candidate_neighbors[to]:
+            if not in_mst[next_to]:  # If the next city is not in the MST
+                dist = haversine(cities[to][1], cities[to][2], cities[next_to][1], cities[next_to][2])
+                heapq.heappush(min_edge, (dist, next_to, to))  # Add the edge to the min-heap
+
+    # A disconnected candidate graph falls back to the search on the complete graph
+    if len(edges) != num_cities - 1:
+        return dense_prim_mst(cities, points)
     return edges
 
 # Create adjacency list using city names from the edges of the MST
@@ -58,33 +191,59 @@ def create_adjacency_list(edges, cities):
 
 def add_edges_to_degree(adj_list, cities, desired_degree):
     """Add edges to the adjacency list to achieve the desired degree for each node."""
-    
-    for city in cities:
+    from scipy.spatial import cKDTree
+    num_cities = len(cities)
+    if num_cities < 2:
+        return adj_list
+
+    # Spatial index over the cities on the unit sphere
+    points = unit_sphere_coordinates([city[1] for city in cities], [city[2] for city in cities])
+    tree = cKDTree(points)
+
+    # The city itself, its current neighbors and the missing edges fit into the desired_degree + 1 nearest cities
+    initial_k = min(desired_degree + 1, num_cities)
+    chords, indices = tree.query(points, k=initial_k)
+    chords = chords.reshape(num_cities, -1)
+    indices = indices.reshape(num_cities, -1)
+
+    for i, city in enumerate(cities):
         city_name = city[0]
-        current_degree = len(adj_list[city_name])
-        if current_degree >= desired_degree:
+        missing = desired_degree - len(adj_list[city_name])
+        if missing <= 0:
             continue
-        
-        # Calculate the distance from the city to all other cities
-        nearest_cities = []
-        for other_city in cities:
-            if city_name != other_city[0] and other_city[0] not in adj_list[city_name]:
-                dist = haversine(city[1], city[2], other_city[1], other_city[2])
-                nearest_cities.append((dist, other_city[0]))
-        
-        # Sort cities by distance
-        nearest_cities.sort()  
-        
+
+        k = initial_k
+        city_chords, city_indices = chords[i], indices[i]
+        while True:
+            # Calculate the exact distance to every candidate that is not yet connected
+            nearest_cities = []
+            for chord, j in zip(city_chords.tolist(), city_indices.tolist()):
+                other_city = cities[j]
+                if city_name != other_city[0] and other_city[0] not in adj_list[city_name]:
+                    dist = haversine(city[1], city[2], other_city[1], other_city[2])
+                    nearest_cities.append((dist, other_city[0], chord))
+
+            # Sort cities by distance, ties are broken by name like a full scan would
+            nearest_cities.sort()
+            selected = nearest_cities[:missing]
+
+            # The selection is final once all cities were seen or the farthest candidate is clearly farther than the last selected one
+            if k >= num_cities or (len(selected) == missing and city_chords[-1] > selected[-1][2] * (1 + 1e-9)):
+                break
+
+            # Otherwise look at twice as many candidates
+            k = min(2 * k, num_cities)
+            city_chords, city_indices = tree.query(points[i], k=k)
+
         # Add edges to the nearest cities until the desired degree is achieved
-        for dist, nearest_city in nearest_cities:
-            if len(adj_list[city_name]) < desired_degree:
-                adj_list[city_name][nearest_city] = dist
-                adj_list[nearest_city][city_name] = dist
-    
+        for dist, nearest_city, _ in selected:
+            adj_list[city_name][nearest_city] = dist
+            adj_list[nearest_city][city_name] = dist
+
     return adj_list
 
-def generate_random_graph(city_data_df, desired_degree):
-    """Generate a random graph with a given degree for each node."""
+def generate_random_graph(city_data_df, desired_degree, as_csr=False):
+    """Generate a random graph with a given degree for each node, as a CSRGraph (node ids in DataFrame order) if as_csr is set."""
     # Extract city data from DataFrame
     cities = city_data_df[['city', 'lat', 'lng']].values.tolist()  
 
@@ -97,4 +256,8 @@ def generate_random_graph(city_data_df, desired_degree):
     # Add edges to achieve the desired degree
     adj_list = add_edges_to_degree(adj_list, cities, desired_degree)  
 
+    # Pack the adjacency list into arrays, node ids follow the order of the DataFrame rows
+    if as_csr:
+        return adjacency_to_csr(adj_list, [city[0] for city in cities])
+
     return adj_list
@@ -1,64 +1,106 @@
 """
-This module contains a function to plot cities and their connections on a map, highlighting the shortest path and checked nodes.
+This module contains functions to plot cities and their connections on a map, highlighting the shortest path and checked nodes.
 """
 
+import os
+from functools import lru_cache
+import numpy as np
 import matplotlib.pyplot as plt
-import geopandas as gpd
+from matplotlib.collections import LineCollection
+from matplotlib.figure import Figure
+from csr_graph import adjacency_to_csr
+from make_graph import build_coordinate_index
 
-def plot_cities_with_connections(city_data_df, adj_list, shapefile_path, path, checked_nodes, min_population):
-    """Plots the cities with connections, highlighting the shortest path and checked nodes if provided."""
-    # Load the shapefile
+@lru_cache(maxsize=None)
+def load_state_boundaries(shapefile_path):
+    """Loads the state boundaries of a shapefile once as a list of (lng, lat) line arrays."""
+    # geopandas is only imported when a map is drawn
+    import geopandas as gpd
     gdf = gpd.read_file(shapefile_path)
+    lines = []
+    for boundary in gdf.boundary:
+        # Boundaries of states with islands consist of several lines
+        for line in getattr(boundary, 'geoms', [boundary]):
+            lines.append(np.asarray(line.coords)[:, :2])
+    return lines
+
+def city_points(coords):
+    """Returns the (lng, lat) position in degrees of every node id of a CoordinateIndex."""
+    return np.column_stack((np.degrees(coords.lng), np.degrees(coords.lat)))
+
+def edge_segments(graph, points):
+    """Returns one line segment per undirected connection of a CSRGraph."""
+    sources = np.repeat(np.arange(graph.num_nodes), np.diff(graph.offsets))
+
+    # Every connection is stored in both directions, it is only drawn from its smaller node id
+    keep = sources < graph.targets
+    return np.stack((points[sources[keep]], points[graph.targets[keep]]), axis=1)
 
-    # Plotting the country and state borders
-    _, ax = plt.subplots(figsize=(10, 6))
-    
-    # Plot state boundaries with thin lines
-    gdf.boundary.plot(ax=ax, linewidth=0.5, edgecolor='black')
-    
-    # Plotting the cities on a map
-    ax.scatter(city_data_df['lng'], city_data_df['lat'], s=10, alpha=0.5, c='blue', edgecolors='k', linewidth=1, label='Cities')
-    
-    # Plot lines based on the adjacency list
-    for i, (city, neighbors) in enumerate(adj_list.items()):
-        city_row = city_data_df[city_data_df['city'] == city].iloc[0]
-        city_lat, city_lng = city_row['lat'], city_row['lng']
-        for neighbor, _ in neighbors.items():
-            neighbor_row = city_data_df[city_data_df['city'] == neighbor].iloc[0]
-            neighbor_lat, neighbor_lng = neighbor_row['lat'], neighbor_row['lng']
-            ax.plot([city_lng, neighbor_lng], [city_lat, neighbor_lat], 'grey', alpha=0.3, linewidth=0.7)
+def draw_map(ax, graph, coords, shapefile_path):
+    """Draws the state boundaries, all connections and all cities, each as a single collection."""
+    points = city_points(coords)
+    ax.add_collection(LineCollection(load_state_boundaries(shapefile_path), linewidths=0.5, colors='black'))
+    ax.add_collection(LineCollection(edge_segments(graph, points), linewidths=0.7, colors='grey', alpha=0.3))
+    ax.scatter(points[:, 0], points[:, 1], s=10, alpha=0.5, c='blue', edgecolors='k', linewidth=1, label='Cities')
+    ax.autoscale_view()
+    ax.set_xlabel('Longitude')
+    ax.set_ylabel('Latitude')
+    ax.grid(True)
+
+def draw_query(ax, coords, path, checked_nodes, stats=None):
+    """Draws the result of one query and returns the added artists, so they can be removed again."""
+    points = city_points(coords)
+    artists = []
 
-    
     # Highlight the shortest path if provided
     if path:
-        for i in range(len(path) - 1):
-            start_city = path[i]
-            end_city = path[i+1]
-            start_row = city_data_df[city_data_df['city'] == start_city].iloc[0]
-            end_row = city_data_df[city_data_df['city'] == end_city].iloc[0]
-            ax.plot([start_row['lng'], end_row['lng']], [start_row['lat'], end_row['lat']], 'r-', linewidth=2, label=f'Shortest Path ({len(path)})' if i == 0 else "")
-        
+        path_points = points[[coords.node_id(city) for city in path]]
+        artists += ax.plot(path_points[:, 0], path_points[:, 1], 'r-', linewidth=2, label=f'Shortest Path ({len(path)})')
+
         # Annotate the first and last city in the path
-        start_city = path[0]
-        end_city = path[-1]
-        start_row = city_data_df[city_data_df['city'] == start_city].iloc[0]
-        end_row = city_data_df[city_data_df['city'] == end_city].iloc[0]
-        ax.annotate(start_city, (start_row['lng'], start_row['lat']), textcoords="offset points", xytext=(0,10), ha='center', fontsize='medium', weight='bold', color='black')
-        ax.annotate(end_city, (end_row['lng'], end_row['lat']), textcoords="offset points", xytext=(0,10), ha='center', fontsize='medium', weight='bold', color='black')
-    
+        for city, point in ((path[0], path_points[0]), (path[-1], path_points[-1])):
+            artists.append(ax.annotate(city, point, textcoords="offset points", xytext=(0,10), ha='center', fontsize='medium', weight='bold', color='black'))
+
     # Highlight checked nodes if provided
     if checked_nodes:
-        checked_lats = city_data_df[city_data_df['city'].isin(checked_nodes)]['lat']
-        checked_lngs = city_data_df[city_data_df['city'].isin(checked_nodes)]['lng']
-        ax.scatter(checked_lngs, checked_lats, s=30, alpha=0.7, c='yellow', edgecolors='k', linewidth=1, label=f'Checked Nodes ({len(checked_nodes)})')
-    
-    # Adding labels and title
-    plt.title(f'Cities in the US with more than {min_population} people')
-    plt.xlabel('Longitude')
-    plt.ylabel('Latitude')
-    plt.grid(True)
-    
-    # Add legend
-    plt.legend()
-    
-    plt.show()
\ No newline at end of file
+        checked_points = points[[coords.node_id(city) for city in set(checked_nodes)]]
+        # The number of checked nodes is read from the search statistics if they were recorded
+        checked_count = stats.pops if stats is not None else len(checked_nodes)
+        artists.append(ax.scatter(checked_points[:, 0], checked_points[:, 1], s=30, alpha=0.7, c='yellow', edgecolors='k', linewidth=1, label=f'Checked Nodes ({checked_count})'))
+
+    # A fixed corner, finding the 'best' legend position is slow with thousands of points
+    artists.append(ax.legend(loc='lower left'))
+    return artists
+
+def render_query(graph, coords, shapefile_path, path=None, checked_nodes=None, title='', stats=None, output_file=None):
+    """Plots the graph with one query result, saved to output_file without opening a window if it is given."""
+    if output_file is None:
+        _, ax = plt.subplots(figsize=(10, 6))
+    else:
+        ax = Figure(figsize=(10, 6)).add_subplot()
+    draw_map(ax, graph, coords, shapefile_path)
+    draw_query(ax, coords, path, checked_nodes, stats)
+    ax.set_title(title)
+
+    if output_file is None:
+        plt.show()
+    else:
+        ax.figure.savefig(output_file)
+
+def save_query_plots(graph, coords, shapefile_path, results, output_dir, title=''):
+    """Saves one image per (file_name, path, checked_nodes) result, the map is drawn only once for all of them."""
+    os.makedirs(output_dir, exist_ok=True)
+    ax = Figure(figsize=(10, 6)).add_subplot()
+    draw_map(ax, graph, coords, shapefile_path)
+    ax.set_title(title)
+    for file_name, path, checked_nodes in results:
+        artists = draw_query(ax, coords, path, checked_nodes)
+        ax.figure.savefig(os.path.join(output_dir, file_name))
+        for artist in artists:
+            artist.remove()
+
+def plot_cities_with_connections(city_data_df, adj_list, shapefile_path, path, checked_nodes, min_population, stats=None):
+    """Plots the cities with connections, highlighting the shortest path and checked nodes if provided."""
+    graph = adjacency_to_csr(adj_list, city_data_df['city'].tolist())
+    coords = build_coordinate_index(city_data_df)
+    render_query(graph, coords, shapefile_path, path, checked_nodes, f'Cities in the US with more than {min_population} people', stats)
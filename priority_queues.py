@@ -0,0 +1,190 @@
+"""
+This module contains priority queues that can be plugged into the shortest path solvers instead of the default heapq loop.
+"""
+
+from heapq import heappop, heappush
+import struct
+import numpy as np
+
+class HeapQueue:
+    """Binary heap from heapq with lazy deletion, outdated entries stay in the queue until they are popped."""
+
+    def __init__(self):
+        self.heap = []
+
+    def __len__(self):
+        return len(self.heap)
+
+    def push(self, key, node):
+        """Adds an entry, an older entry of the same node is left behind."""
+        heappush(self.heap, (key, node))
+
+    def pop(self):
+        """Removes and returns the (key, node) entry with the smallest key."""
+        return heappop(self.heap)
+
+class IndexedHeap:
+    """Binary heap with a position table per node, so a node is stored once and its key can be decreased in place."""
+
+    def __init__(self, num_nodes):
+        self.nodes = []  # Heap of node ids
+        self.keys = [0.0] * num_nodes  # Current key of every queued node
+        self.position = [-1] * num_nodes  # Index of every node in the heap, -1 if it is not queued
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def push(self, key, node):
+        """Inserts a node or decreases its key, larger keys for a queued node are ignored."""
+        i = self.position[node]
+        if i == -1:
+            self.nodes.append(node)
+            i = len(self.nodes) - 1
+        elif key >= self.keys[node]:
+            return
+        self.keys[node] = key
+        self.sift_up(i, node, key)
+
+    def pop(self):
+        """Removes and returns the (key, node) entry with the smallest key."""
+        nodes = self.nodes
+        top = nodes[0]
+        last = nodes.pop()
+        self.position[top] = -1
+        if nodes:
+            self.sift_down(0, last, self.keys[last])
+        return self.keys[top], top
+
+    def sift_up(self, i, node, key):
+        """Moves node up from index i until its parent has a smaller key."""
+        nodes, keys, position = self.nodes, self.keys, self.position
+        while i > 0:
+            parent = (i - 1) >> 1
+            parent_node = nodes[parent]
+            if keys[parent_node] <= key:
+                break
+            nodes[i] = parent_node
+            position[parent_node] = i
+            i = parent
+        nodes[i] = node
+        position[node] = i
+
+    def sift_down(self, i, node, key):
+        """Moves node down from index i until both children have larger keys."""
+        nodes, keys, position = self.nodes, self.keys, self.position
+        size = len(nodes)
+        while True:
+            child = 2 * i + 1
+            if child >= size:
+                break
+            if child + 1 < size and keys[nodes[child + 1]] < keys[nodes[child]]:
+                child += 1
+            child_node = nodes[child]
+            if keys[child_node] >= key:
+                break
+            nodes[i] = child_node
+            position[child_node] = i
+            i = child
+        nodes[i] = node
+        position[node] = i
+
+def float_bits(key):
+    """Returns the IEEE 754 bit pattern of a non-negative float as an integer, which has the same order as the floats."""
+    return struct.unpack('<q', struct.pack('<d', key))[0]
+
+class RadixHeap:
+    """Monotone radix heap over the bit patterns of float keys, keys may never be smaller than the last popped one."""
+
+    monotone = True
+
+    def __init__(self):
+        self.buckets = [[] for _ in range(65)]  # Bucket i holds keys whose highest bit differing from last is bit i - 1
+        self.last = 0  # Bit pattern of the last popped key
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def push(self, key, node):
+        """Adds an entry, keys below the last popped one (rounding in A*) are treated as equal to it."""
+        bits = max(float_bits(key), self.last)
+        self.buckets[(bits ^ self.last).bit_length()].append((bits, key, node))
+        self.size += 1
+
+    def pop(self):
+        """Removes and returns the (key, node) entry with the smallest key."""
+        buckets = self.buckets
+        if not buckets[0]:
+            # Refill bucket 0 from the first non-empty bucket, its entries spread over lower buckets around the new minimum
+            i = 1
+            while not buckets[i]:
+                i += 1
+            entries = buckets[i]
+            buckets[i] = []
+            self.last = min(entries)[0]
+            for entry in entries:
+                buckets[(entry[0] ^ self.last).bit_length()].append(entry)
+        self.size -= 1
+        _, key, node = buckets[0].pop()
+        return key, node
+
+class DialQueue:
+    """Dial's bucket queue with buckets one bucket_width wide (default one meter), keys must grow monotonically by at most span."""
+
+    monotone = True
+
+    def __init__(self, span, bucket_width=0.001):
+        self.bucket_width = bucket_width
+        self.num_buckets = int(np.ceil(span / bucket_width)) + 2  # Circular buckets covering every key that can be queued at once
+        self.occupied = np.zeros(self.num_buckets, dtype=bool)
+        self.buckets = {}  # Slot to list of (key, node) entries, only non-empty buckets are stored
+        self.current = 0  # Absolute bucket number of the last popped key
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def push(self, key, node):
+        """Adds an entry to the bucket of its key, keys below the current bucket (rounding in A*) go to the current bucket."""
+        slot = max(int(key / self.bucket_width), self.current) % self.num_buckets
+        self.buckets.setdefault(slot, []).append((key, node))
+        self.occupied[slot] = True
+        self.size += 1
+
+    def pop(self):
+        """Removes and returns the (key, node) entry with the smallest key."""
+        # Scan forward to the next occupied bucket, wrapping around the end of the circular array
+        slot = self.current % self.num_buckets
+        if not self.occupied[slot]:
+            offset = int(np.argmax(self.occupied[slot:]))
+            if not self.occupied[slot + offset]:
+                offset = self.num_buckets - slot + int(np.argmax(self.occupied[:slot]))
+            self.current += offset
+            slot = self.current % self.num_buckets
+
+        # A bucket only holds keys less than a bucket_width apart, taking the smallest keeps the order exact
+        bucket = self.buckets[slot]
+        i = min(range(len(bucket)), key=lambda j: bucket[j][0])
+        entry = bucket[i]
+        bucket[i] = bucket[-1]
+        bucket.pop()
+        if not bucket:
+            del self.buckets[slot]
+            self.occupied[slot] = False
+        self.size -= 1
+        return entry
+
+QUEUES = ['heapq', 'indexed', 'radix', 'dial']
+
+def make_queue(queue, num_nodes, span):
+    """Creates the named queue for a search over num_nodes nodes whose queued keys lie at most span above the smallest one."""
+    if queue == 'heapq':
+        return HeapQueue()
+    elif queue == 'indexed':
+        return IndexedHeap(num_nodes)
+    elif queue == 'radix':
+        return RadixHeap()
+    elif queue == 'dial':
+        return DialQueue(span)
+    else:
+        raise ValueError(f"Unknown priority queue: {queue}")
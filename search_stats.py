@@ -0,0 +1,44 @@
+"""
+This module contains the opt-in statistics object the shortest path solvers fill when one is passed to them.
+"""
+
+import time
+from contextlib import contextmanager
+
+class SearchStats:
+    """Counters for the effort of one or more searches, with an optional callback for every expansion."""
+
+    COUNTERS = ['pops', 'stale_pops', 'pushes', 'relaxations', 'heuristic_evaluations', 'peak_heap_size']
+
+    def __init__(self, trace=None, record_checked=True):
+        self.trace = trace  # Called as trace(node, key) for every popped node, or None
+        self.record_checked = record_checked  # If False, searches return None instead of their checked_nodes list
+        self.reset()
+
+    def reset(self):
+        """Sets all counters and phase times back to zero."""
+        self.pops = 0  # Nodes taken from the priority queue, including stale entries
+        self.stale_pops = 0  # Popped entries that were outdated by a shorter path found later
+        self.pushes = 0  # Entries put into the priority queue
+        self.relaxations = 0  # Edges looked at while expanding nodes
+        self.heuristic_evaluations = 0  # Heuristic values requested by A*
+        self.peak_heap_size = 0  # Largest size of the priority queue
+        self.phase_times = {}  # Wall time in seconds per phase ('init', 'search', 'path')
+
+    @contextmanager
+    def phase(self, name):
+        """Adds the wall time of the enclosed block to the given phase."""
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phase_times[name] = self.phase_times.get(name, 0.0) + time.perf_counter() - start_time
+
+    def as_dict(self):
+        """Returns all counters and phase times as a plain dictionary."""
+        stats = {name: getattr(self, name) for name in self.COUNTERS}
+        stats['phase_times'] = dict(self.phase_times)
+        return stats
+
+    def __repr__(self):
+        return f"SearchStats({', '.join(f'{name}={value}' for name, value in self.as_dict().items())})"
@@ -0,0 +1,177 @@
+"""
+This module is a long-lived query server that keeps the graph in memory and answers shortest path requests as JSON lines on stdin/stdout or a Unix socket.
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import signal
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from graph_cache import CachedGraph, load_or_build_graph
+from sspp_solvers import astar, batch_dijkstra
+
+# The cached graph of a worker process, its arrays are memory-mapped from the same cache files as in the server
+worker_graph = None
+
+def init_worker(entry_dir):
+    """Opens the cached graph once per worker process."""
+    global worker_graph
+    worker_graph = CachedGraph(entry_dir)
+
+def solve_batch(start, ends):
+    """Answers Dijkstra queries from one start to several ends with a single search, returning (path, total_weight, checked_count) per end."""
+    return batch_dijkstra(worker_graph.graph, [(start, end) for end in ends])
+
+def solve_astar(start, end, epsilon):
+    """Answers one A* query, returning (path, total_weight, checked_count)."""
+    path, total_weight, checked_nodes = astar(worker_graph.graph, start, end, epsilon=epsilon, coords=worker_graph.coords)
+    return path, total_weight, len(checked_nodes)
+
+class QueryServer:
+    """Answers JSON requests on a resident graph, Dijkstra requests for the same start that arrive together share one search."""
+
+    def __init__(self, cached_graph, workers=None, batch_window=0.002):
+        self.index = cached_graph.graph.index
+        self.batch_window = batch_window  # Seconds a new start waits for more requests before its search is started
+        # Spawned (not forked) workers do not inherit the sockets of connections accepted before they started
+        self.pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                        initializer=init_worker, initargs=(cached_graph.entry_dir,))
+        self.pending = {}  # Start city to the (end, future) pairs waiting for its batch
+        self.tasks = set()  # Running batches, referenced until they finish
+
+    async def query(self, request):
+        """Answers one request dictionary with a response dictionary."""
+        start, end = request.get('start'), request.get('end')
+        for city in (start, end):
+            if city not in self.index:
+                raise ValueError(f"Unknown city: {city}")
+
+        algorithm = request.get('algorithm', 'dijkstra')
+        loop = asyncio.get_running_loop()
+        if algorithm == 'dijkstra':
+            # Join the batch of this start, the first request of a batch schedules its search
+            future = loop.create_future()
+            if start not in self.pending:
+                self.pending[start] = []
+                loop.call_later(self.batch_window, self.dispatch, start)
+            self.pending[start].append((end, future))
+            path, total_weight, checked_count, batch_size = await future
+        elif algorithm == 'astar':
+            path, total_weight, checked_count = await loop.run_in_executor(self.pool, solve_astar, start, end, float(request.get('epsilon', 1.0)))
+            batch_size = 1
+        else:
+            raise ValueError(f"Unknown algorithm: {algorithm}")
+
+        # Unreachable cities have no path and no distance
+        if not path:
+            path, total_weight = None, None
+        return {'path': path, 'distance': total_weight, 'checked_nodes': checked_count, 'batch_size': batch_size}
+
+    def dispatch(self, start):
+        """Hands the collected batch of a start to the worker pool."""
+        task = asyncio.ensure_future(self.run_batch(start, self.pending.pop(start)))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def run_batch(self, start, batch):
+        """Runs one search for a batch and resolves the futures of all its requests."""
+        loop = asyncio.get_running_loop()
+        try:
+            results = await loop.run_in_executor(self.pool, solve_batch, start, [end for end, _ in batch])
+        except Exception as error:
+            for _, future in batch:
+                future.set_exception(error)
+            return
+        for (_, future), (path, total_weight, checked_count) in zip(batch, results):
+            future.set_result((path, total_weight, checked_count, len(batch)))
+
+    async def handle_line(self, line, write):
+        """Answers one JSON line and writes the response line, errors are answered instead of stopping the server."""
+        request = {}
+        try:
+            request = json.loads(line)
+            response = await self.query(request)
+        except Exception as error:
+            response = {'error': str(error)}
+        if isinstance(request, dict) and 'id' in request:
+            response['id'] = request['id']
+        await write(json.dumps(response))
+
+    async def serve_stream(self, reader, write):
+        """Answers every line of a stream concurrently, responses are written as they finish (matched by their id)."""
+        handlers = set()
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            if line.strip():
+                handler = asyncio.ensure_future(self.handle_line(line, write))
+                handlers.add(handler)
+                handler.add_done_callback(handlers.discard)
+
+        # Answer the requests that are still running before the stream is closed
+        if handlers:
+            await asyncio.wait(handlers)
+
+    async def serve_stdio(self):
+        """Reads requests from stdin and writes responses to stdout until stdin is closed."""
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader()
+        await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+
+        async def write(text):
+            sys.stdout.write(text + '\n')
+            sys.stdout.flush()
+
+        await self.serve_stream(reader, write)
+
+    async def serve_unix(self, socket_path):
+        """Accepts connections on a Unix socket, every connection is a stream of requests."""
+        async def handle_connection(reader, writer):
+            async def write(text):
+                writer.write((text + '\n').encode())
+                await writer.drain()
+
+            await self.serve_stream(reader, write)
+            writer.close()
+
+        server = await asyncio.start_unix_server(handle_connection, socket_path)
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        """Shuts the worker pool down."""
+        self.pool.shutdown()
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve shortest path queries on a resident graph as JSON lines.')
+    parser.add_argument('--csv-file', default='Data/uscities.csv')
+    parser.add_argument('--min-population', type=int, default=500000)
+    parser.add_argument('--desired-degree', type=int, default=7)
+    parser.add_argument('--socket', help='Unix socket path, stdin/stdout is used if not given')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--batch-window', type=float, default=0.002, help='Seconds requests for the same start are collected')
+    args = parser.parse_args()
+
+    # Load the Graph from the cache (built first if an input changed), the workers memory-map the same files
+    cached_graph = load_or_build_graph(args.csv_file, args.min_population, args.desired_degree)
+    server = QueryServer(cached_graph, args.workers, args.batch_window)
+    print(f"Serving {len(cached_graph.names)} cities", file=sys.stderr)
+
+    # Stop on SIGTERM like on Ctrl+C, so the worker pool is shut down as well
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        if args.socket:
+            asyncio.run(server.serve_unix(args.socket))
+        else:
+            asyncio.run(server.serve_stdio())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+if __name__ == "__main__":
+    main()
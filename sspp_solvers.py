@@ -2,12 +2,41 @@
 This module contains implementations of shortest path algorithms such as Dijkstra's and A*.
 """
 
-from heapq import heappop, heappush
-from make_graph import haversine
+from heapq import heapify, heappop, heappush
+import time
+import numpy as np
+from csr_graph import CSRGraph, NamedNodes, as_csr_graph, cached_csr_graph
+from make_graph import build_coordinate_index, haversine
+from priority_queues import make_queue
+from search_stats import SearchStats
 
-def dijkstra(adj_list, start, end):
+def trace_path(previous_nodes, start_id, end_id):
+    """Reconstructs the node id path from start to end by following a predecessor array."""
+    path = [end_id]
+    while path[-1] != start_id:
+        path.append(int(previous_nodes[path[-1]]))
+    path.reverse()
+    return path
+
+def dijkstra(adj_list, start, end, stats=None, queue=None, arc_flags=None):
     """Implements Dijkstra's algorithm to find the shortest path between start and end nodes."""
     
+    # Arc flags reduce the graph to the edges that lead toward the region of the end node
+    if arc_flags is not None:
+        adj_list = arc_flags.pruned_graph(adj_list, end)
+
+    # A named priority queue from priority_queues replaces the built-in heapq loop
+    if queue is not None:
+        return queue_search(cached_csr_graph(adj_list), start, end, queue, stats=stats)
+
+    # Instrumented searches run in their own loop on the array-backed graph, so searches without stats pay nothing for them
+    if stats is not None:
+        return dijkstra_csr_stats(cached_csr_graph(adj_list), start, end, stats)
+
+    # Array-backed graphs are searched on integer node ids
+    if isinstance(adj_list, CSRGraph):
+        return dijkstra_csr(adj_list, start, end)
+
     # Initialize the distance to all nodes as infinity and previous nodes as None
     distances = {node: float('inf') for node in adj_list}
     previous_nodes = {node: None for node in adj_list}
@@ -26,11 +55,10 @@ def dijkstra(adj_list, start, end):
 
         # If the end node is reached, reconstruct the path
         if current_node == end:
-            path = []
-            while previous_nodes[current_node] is not None:
-                path.insert(0, current_node)
-                current_node = previous_nodes[current_node]
-            path.insert(0, start)
+            path = [current_node]
+            while previous_nodes[path[-1]] is not None:
+                path.append(previous_nodes[path[-1]])
+            path.reverse()
             return path, distances[end], checked_nodes
         
         # If the current node's distance is greater than the stored distance, skip this node
@@ -50,6 +78,45 @@ def dijkstra(adj_list, start, end):
     # If the end node is not reachable, return empty path and infinite distance
     return [], float('inf'), checked_nodes
 
+def dijkstra_csr(graph, start, end):
+    """Implements Dijkstra's algorithm on a CSRGraph, the result is reported with city names like dijkstra."""
+    start_id = graph.node_id(start)
+    end_id = graph.node_id(end)
+    # Plain Python lists are faster than NumPy for the few neighbors of one node at a time
+    neighbor_lists = graph.neighbor_lists
+
+    # Distances and predecessors are flat lists indexed by node id
+    distances = [float('inf')] * graph.num_nodes
+    previous_nodes = [-1] * graph.num_nodes
+    distances[start_id] = 0.0
+
+    priority_queue = [(0.0, start_id)]
+    checked_nodes = []
+
+    while priority_queue:
+        current_distance, current_node = heappop(priority_queue)
+        checked_nodes.append(current_node)
+
+        # If the end node is reached, reconstruct the path
+        if current_node == end_id:
+            path = trace_path(previous_nodes, start_id, end_id)
+            return [graph.names[i] for i in path], distances[end_id], [graph.names[i] for i in checked_nodes]
+
+        # If the current node's distance is greater than the stored distance, skip this node
+        if current_distance > distances[current_node]:
+            continue
+
+        # Explore the neighbors of the current node
+        for neighbor, weight in neighbor_lists[current_node]:
+            distance = current_distance + weight
+            if distance < distances[neighbor]:
+                distances[neighbor] = distance
+                previous_nodes[neighbor] = current_node
+                heappush(priority_queue, (distance, neighbor))
+
+    # If the end node is not reachable, return empty path and infinite distance
+    return [], float('inf'), [graph.names[i] for i in checked_nodes]
+
 def heuristic(node1, node2, cities_df):
     """Implements the heuristic for the A* algorithm, which is the estimated distance from the current node to the end node."""
     
@@ -57,9 +124,61 @@ def heuristic(node1, node2, cities_df):
     city2 = cities_df[cities_df['city'] == node2].iloc[0]
     return haversine(city1['lat'], city1['lng'], city2['lat'], city2['lng'])
 
-def astar(graph, start, end, cities_df, epsilon=1.0):
+def select_heuristic(cities_df=None, coords=None, heuristic=None):
+    """Returns the heuristic table for A*: the given heuristic, else the coordinate index (built from cities_df if needed)."""
+    if heuristic is not None:
+        return heuristic
+    if coords is not None:
+        return coords
+    return build_coordinate_index(cities_df)
+
+class RemappedHeuristic(NamedNodes):
+    """A heuristic table built for another node order, looked up through the city names of the graph."""
+
+    def __init__(self, heuristic, names):
+        self.heuristic = heuristic
+        self.names = list(names)  # City name of every node id of the graph
+        missing = [name for name in self.names if name not in heuristic.index]
+        if missing:
+            raise ValueError(f"The heuristic has no entry for city: {missing[0]}")
+        self.order = np.array([heuristic.index[name] for name in self.names], dtype=np.int64)  # Heuristic node id of every graph node id
+
+    def estimate(self, node_ids, target_id):
+        """Returns the estimate of the wrapped heuristic for every given graph node id."""
+        return self.heuristic.estimate(self.order[node_ids], int(self.order[target_id]))
+
+def align_heuristic(graph, heuristic):
+    """Returns the heuristic with the node ids of a CSRGraph, remapped by city name if it was built in another order."""
+    if heuristic.names == graph.names:
+        return heuristic
+    return RemappedHeuristic(heuristic, graph.names)
+
+def astar(graph, start, end, cities_df=None, epsilon=1.0, coords=None, heuristic=None, stats=None, queue=None, arc_flags=None):
     """Implements the A* algorithm to find the shortest path between start and end nodes with a given epsilon."""
-    
+
+    # The heuristic is any table with estimate(node_ids, target_id), by default the Haversine distance from a CoordinateIndex
+    coords = select_heuristic(cities_df, coords, heuristic)
+
+    # Arc flags reduce the graph to the edges that lead toward the region of the end node
+    if arc_flags is not None:
+        graph = arc_flags.pruned_graph(graph, end)
+
+    # The heuristic is indexed by node id, which must mean the same city in an array-backed graph
+    if isinstance(graph, CSRGraph):
+        coords = align_heuristic(graph, coords)
+
+    # A named priority queue from priority_queues replaces the built-in heapq loop
+    if queue is not None:
+        return queue_search(cached_csr_graph(graph, coords.names), start, end, queue, coords, epsilon, stats)
+
+    # Instrumented searches run in their own loop on the array-backed graph, so searches without stats pay nothing for them
+    if stats is not None:
+        return astar_csr_stats(cached_csr_graph(graph, coords.names), start, end, coords, epsilon, stats)
+
+    # Array-backed graphs are searched on integer node ids
+    if isinstance(graph, CSRGraph):
+        return astar_csr(graph, start, end, coords, epsilon)
+
     # Priority queue to hold nodes to explore, initialized with the start node and its heuristic cost
     open_list = []
     heappush(open_list, (0, start))
@@ -67,11 +186,10 @@ def astar(graph, start, end, cities_df, epsilon=1.0):
     # Dictionary to reconstruct the path
     came_from = {}
     
-    # Initialize g_score (cost from start to each node) and f_score (g_score + heuristic)
+    # Initialize g_score (cost from start to each node)
     g_score = {node: float('inf') for node in graph}
     g_score[start] = 0
-    f_score = {node: float('inf') for node in graph}
-    f_score[start] = heuristic(start, end, cities_df) * epsilon
+    end_id = coords.index[end]
     
     # List to keep track of the nodes that have been checked
     checked_nodes = []
@@ -93,15 +211,611 @@ def astar(graph, start, end, cities_df, epsilon=1.0):
             return path, total_weight, checked_nodes
 
         # Explore the neighbors of the current node
+        improved = []
         for neighbor, weight in graph[current].items():
             tentative_g_score = g_score[current] + weight
             
-            # If a shorter path to the neighbor is found, update g_score, f_score, and queue
+            # If a shorter path to the neighbor is found, update g_score and remember it for the queue
             if tentative_g_score < g_score[neighbor]:
                 came_from[neighbor] = current
                 g_score[neighbor] = tentative_g_score
-                f_score[neighbor] = g_score[neighbor] + heuristic(neighbor, end, cities_df) * epsilon
-                heappush(open_list, (f_score[neighbor], neighbor))
+                improved.append(neighbor)
+
+        # Look up the heuristic for all improved neighbors in one call, then queue them with their f_score
+        if improved:
+            estimates = coords.estimate(np.array([coords.index[neighbor] for neighbor in improved]), end_id)
+            for neighbor, estimate in zip(improved, estimates.tolist()):
+                heappush(open_list, (g_score[neighbor] + estimate * epsilon, neighbor))
 
     # If the end node is not reachable, return None and infinite weight
     return None, float('inf'), checked_nodes
+
+def astar_csr(graph, start, end, coords, epsilon=1.0):
+    """Implements the A* algorithm on a CSRGraph, the heuristic table coords must use the same node ids as the graph."""
+    start_id = graph.node_id(start)
+    end_id = graph.node_id(end)
+    neighbor_lists = graph.neighbor_lists
+
+    # g_score and predecessors are flat lists indexed by node id
+    g_score = [float('inf')] * graph.num_nodes
+    came_from = [-1] * graph.num_nodes
+    g_score[start_id] = 0.0
+
+    open_list = [(0.0, start_id)]
+    checked_nodes = []
+
+    while open_list:
+        # Pop the node with the smallest f_score from the queue
+        _, current = heappop(open_list)
+        checked_nodes.append(current)
+
+        # If the end node is reached, reconstruct the path
+        if current == end_id:
+            path = trace_path(came_from, start_id, end_id)
+            return [graph.names[i] for i in path], g_score[end_id], [graph.names[i] for i in checked_nodes]
+
+        # Explore the neighbors of the current node
+        g = g_score[current]
+        improved = []
+        for neighbor, weight in neighbor_lists[current]:
+            tentative_g_score = g + weight
+            if tentative_g_score < g_score[neighbor]:
+                g_score[neighbor] = tentative_g_score
+                came_from[neighbor] = current
+                improved.append(neighbor)
+
+        # Look up the heuristic for all improved neighbors in one call, then queue them with their f_score
+        if improved:
+            estimates = coords.estimate(np.array(improved), end_id)
+            for neighbor, estimate in zip(improved, estimates.tolist()):
+                heappush(open_list, (g_score[neighbor] + estimate * epsilon, neighbor))
+
+    # If the end node is not reachable, return None and infinite weight
+    return None, float('inf'), [graph.names[i] for i in checked_nodes]
+
+def dijkstra_csr_stats(graph, start, end, stats):
+    """Implements dijkstra_csr while counting the search effort in a SearchStats object."""
+    trace = stats.trace
+    with stats.phase('init'):
+        start_id = graph.node_id(start)
+        end_id = graph.node_id(end)
+        neighbor_lists = graph.neighbor_lists
+        distances = [float('inf')] * graph.num_nodes
+        previous_nodes = [-1] * graph.num_nodes
+        distances[start_id] = 0.0
+        priority_queue = [(0.0, start_id)]
+        checked_nodes = [] if stats.record_checked else None
+        stats.pushes += 1
+        stats.peak_heap_size = max(stats.peak_heap_size, 1)
+
+    found = False
+    with stats.phase('search'):
+        while priority_queue:
+            current_distance, current_node = heappop(priority_queue)
+            if checked_nodes is not None:
+                checked_nodes.append(current_node)
+            stats.pops += 1
+            if trace is not None:
+                trace(graph.names[current_node], current_distance)
+
+            # If the end node is reached, stop searching
+            if current_node == end_id:
+                found = True
+                break
+
+            # If the current node's distance is greater than the stored distance, skip this node
+            if current_distance > distances[current_node]:
+                stats.stale_pops += 1
+                continue
+
+            # Explore the neighbors of the current node
+            neighbors = neighbor_lists[current_node]
+            stats.relaxations += len(neighbors)
+            for neighbor, weight in neighbors:
+                distance = current_distance + weight
+                if distance < distances[neighbor]:
+                    distances[neighbor] = distance
+                    previous_nodes[neighbor] = current_node
+                    heappush(priority_queue, (distance, neighbor))
+                    stats.pushes += 1
+            stats.peak_heap_size = max(stats.peak_heap_size, len(priority_queue))
+
+    with stats.phase('path'):
+        # Callers that only want the counters get None instead of the checked node names
+        checked_names = None if checked_nodes is None else [graph.names[i] for i in checked_nodes]
+        if not found:
+            return [], float('inf'), checked_names
+        path = trace_path(previous_nodes, start_id, end_id)
+        return [graph.names[i] for i in path], distances[end_id], checked_names
+
+def astar_csr_stats(graph, start, end, coords, epsilon, stats, estimates=None):
+    """Implements astar_csr while counting the search effort in a SearchStats object, optionally with precomputed heuristic values."""
+    trace = stats.trace
+    with stats.phase('init'):
+        start_id = graph.node_id(start)
+        end_id = graph.node_id(end)
+        neighbor_lists = graph.neighbor_lists
+        g_score = [float('inf')] * graph.num_nodes
+        came_from = [-1] * graph.num_nodes
+        g_score[start_id] = 0.0
+        # Queue entries carry the g_score they were pushed with, which only matters to detect stale entries
+        open_list = [(0.0, start_id, 0.0)]
+        checked_nodes = [] if stats.record_checked else None
+        stats.pushes += 1
+        stats.peak_heap_size = max(stats.peak_heap_size, 1)
+
+    found = False
+    with stats.phase('search'):
+        while open_list:
+            # Pop the node with the smallest f_score from the queue
+            f_score, current, pushed_g_score = heappop(open_list)
+            if checked_nodes is not None:
+                checked_nodes.append(current)
+            stats.pops += 1
+            if trace is not None:
+                trace(graph.names[current], f_score)
+
+            # If the end node is reached, stop searching
+            if current == end_id:
+                found = True
+                break
+
+            # The node was reached on a shorter path after this entry was queued
+            if pushed_g_score > g_score[current]:
+                stats.stale_pops += 1
+
+            # Explore the neighbors of the current node
+            g = g_score[current]
+            neighbors = neighbor_lists[current]
+            stats.relaxations += len(neighbors)
+            improved = []
+            for neighbor, weight in neighbors:
+                tentative_g_score = g + weight
+                if tentative_g_score < g_score[neighbor]:
+                    g_score[neighbor] = tentative_g_score
+                    came_from[neighbor] = current
+                    improved.append(neighbor)
+
+            # Look up the heuristic for all improved neighbors in one call, then queue them with their f_score
+            # A list of heuristic values toward end for every node id (see astar_sweep) replaces the lookups
+            if improved:
+                improved_estimates = coords.estimate(np.array(improved), end_id).tolist() if estimates is None else [estimates[i] for i in improved]
+                stats.heuristic_evaluations += len(improved)
+                for neighbor, estimate in zip(improved, improved_estimates):
+                    heappush(open_list, (g_score[neighbor] + estimate * epsilon, neighbor, g_score[neighbor]))
+                stats.pushes += len(improved)
+                stats.peak_heap_size = max(stats.peak_heap_size, len(open_list))
+
+    with stats.phase('path'):
+        # Callers that only want the counters get None instead of the checked node names
+        checked_names = None if checked_nodes is None else [graph.names[i] for i in checked_nodes]
+        if not found:
+            return None, float('inf'), checked_names
+        path = trace_path(came_from, start_id, end_id)
+        return [graph.names[i] for i in path], g_score[end_id], checked_names
+
+def queue_search(graph, start, end, queue, coords=None, epsilon=1.0, stats=None):
+    """Runs Dijkstra (without coords) or A* on a CSRGraph with the named priority queue, outdated queue entries are skipped."""
+    start_id = graph.node_id(start)
+    end_id = graph.node_id(end)
+    weights = graph.weights
+    if coords is not None:
+        coords = align_heuristic(graph, coords)
+
+    # Keys in the queue lie at most one edge above the smallest key in Dijkstra, and two with a consistent A* heuristic
+    span = float(weights.max(initial=0.0, where=np.isfinite(weights)))
+    if coords is not None:
+        span *= 2
+    open_list = make_queue(queue, graph.num_nodes, span)
+    if getattr(open_list, 'monotone', False) and epsilon != 1.0:
+        raise ValueError(f"The {queue} queue needs monotone keys, which weighted A* (epsilon={epsilon}) does not provide")
+
+    # queued_key holds the key of the newest entry of every node, older entries with larger keys are outdated
+    neighbor_lists = graph.neighbor_lists
+    g_score = [float('inf')] * graph.num_nodes
+    came_from = [-1] * graph.num_nodes
+    queued_key = [float('inf')] * graph.num_nodes
+    g_score[start_id] = 0.0
+    queued_key[start_id] = 0.0 if coords is None else float(coords.estimate(np.array([start_id]), end_id)[0]) * epsilon
+    open_list.push(queued_key[start_id], start_id)
+    checked_nodes = []
+    pushes = 1
+    stale_pops = 0
+    relaxations = 0
+    peak_queue_size = 1
+
+    found = False
+    while open_list:
+        # Every pop is a checked node like in the default loop, outdated entries are then skipped
+        key, current = open_list.pop()
+        checked_nodes.append(current)
+        if key > queued_key[current]:
+            stale_pops += 1
+            continue
+
+        # If the end node is reached, reconstruct the path
+        if current == end_id:
+            found = True
+            break
+
+        # Explore the neighbors of the current node
+        g = g_score[current]
+        neighbors = neighbor_lists[current]
+        relaxations += len(neighbors)
+        improved = []
+        for neighbor, weight in neighbors:
+            tentative_g_score = g + weight
+            if tentative_g_score < g_score[neighbor]:
+                g_score[neighbor] = tentative_g_score
+                came_from[neighbor] = current
+                improved.append(neighbor)
+        if not improved:
+            continue
+
+        # Look up the heuristic for all improved neighbors in one call, then queue them with their key
+        estimates = [0.0] * len(improved) if coords is None else (coords.estimate(np.array(improved), end_id) * epsilon).tolist()
+        for neighbor, estimate in zip(improved, estimates):
+            key = g_score[neighbor] + estimate
+            queued_key[neighbor] = key
+            open_list.push(key, neighbor)
+        pushes += len(improved)
+        peak_queue_size = max(peak_queue_size, len(open_list))
+
+    # The counters are added once at the end, so the loop itself is the same with and without stats
+    if stats is not None:
+        stats.pops += len(checked_nodes)
+        stats.stale_pops += stale_pops
+        stats.pushes += pushes
+        stats.relaxations += relaxations
+        stats.peak_heap_size = max(stats.peak_heap_size, peak_queue_size)
+        if coords is not None:
+            stats.heuristic_evaluations += pushes
+
+    checked_names = [graph.names[i] for i in checked_nodes]
+    if not found:
+        # Dijkstra reports an unreachable end with an empty path, A* with None
+        return ([] if coords is None else None), float('inf'), checked_names
+    path = trace_path(came_from, start_id, end_id)
+    return [graph.names[i] for i in path], g_score[end_id], checked_names
+
+def anytime_astar(graph, start, end, cities_df=None, coords=None, heuristic=None, epsilon=3.0, decrease=0.2, time_limit=None, target_bound=1.0):
+    """Anytime Repairing A* (ARA*): yields (path, total_weight, bound, checked_nodes) for every improved solution while epsilon is lowered."""
+    coords = select_heuristic(cities_df, coords, heuristic)
+    graph = as_csr_graph(graph, coords.names)
+    coords = align_heuristic(graph, coords)
+    deadline = None if time_limit is None else time.perf_counter() + time_limit
+    start_id = graph.node_id(start)
+    end_id = graph.node_id(end)
+    neighbor_lists = graph.neighbor_lists
+
+    # g_score and predecessors survive all iterations, only the closed flags are reset when epsilon is lowered
+    g_score = [float('inf')] * graph.num_nodes
+    came_from = [-1] * graph.num_nodes
+    closed = [False] * graph.num_nodes
+    g_score[start_id] = 0.0
+
+    # Queue entries carry the g_score they were pushed with, so outdated entries can be skipped
+    open_list = [(0.0, start_id, 0.0)]
+    incons = []  # Closed nodes that got a shorter path, they are searched again with the next epsilon
+    last_solution = None  # Weight and bound of the last yielded solution
+
+    while True:
+        # Expand nodes until no queued node can improve the path to the end node under the current epsilon
+        checked_nodes = []
+        timed_out = False
+        while open_list:
+            f_score, current, g = open_list[0]
+            if g > g_score[current] or closed[current]:
+                heappop(open_list)
+                continue
+            if g_score[end_id] <= f_score:
+                break
+
+            # An improvement pass stops at the deadline, the first pass always finishes to find a path
+            if last_solution is not None and deadline is not None and time.perf_counter() >= deadline:
+                timed_out = True
+                break
+            heappop(open_list)
+            closed[current] = True
+            checked_nodes.append(current)
+
+            improved = []
+            for neighbor, weight in neighbor_lists[current]:
+                tentative_g_score = g + weight
+                if tentative_g_score < g_score[neighbor]:
+                    g_score[neighbor] = tentative_g_score
+                    came_from[neighbor] = current
+
+                    # Improved nodes that are already closed wait in incons instead of being expanded twice per iteration
+                    if closed[neighbor]:
+                        incons.append(neighbor)
+                    else:
+                        improved.append(neighbor)
+
+            # Look up the heuristic for all improved neighbors in one call, then queue them with their f_score
+            if improved:
+                estimates = coords.estimate(np.array(improved), end_id)
+                for neighbor, estimate in zip(improved, estimates.tolist()):
+                    heappush(open_list, (g_score[neighbor] + estimate * epsilon, neighbor, g_score[neighbor]))
+
+        checked_names = [graph.names[i] for i in checked_nodes]
+
+        # If the end node is not reachable, there is nothing left to improve
+        if g_score[end_id] == float('inf'):
+            yield None, float('inf'), 1.0, checked_names
+            return
+
+        # Every queued or inconsistent node is a candidate for a shorter path, the unweighted f of the best one bounds the error
+        pending = sorted(set([entry[1] for entry in open_list if entry[2] == g_score[entry[1]] and not closed[entry[1]]] + incons))
+        pending_g = [g_score[node] for node in pending]
+        unweighted_f = np.array(pending_g) + coords.estimate(np.array(pending, dtype=np.int64), end_id) if pending else np.array([np.inf])
+        # A path of weight 0 (start == end) is optimal, a best f of 0 leaves only the epsilon bound
+        lowest_f = float(unweighted_f.min())
+        if g_score[end_id] == 0:
+            bound = 1.0
+        elif lowest_f <= 0:
+            bound = max(1.0, epsilon)
+        else:
+            bound = max(1.0, min(epsilon, g_score[end_id] / lowest_f))
+
+        # A pass cut off by the deadline only yields if it still improved the path or its bound
+        solution = (g_score[end_id], bound)
+        if not timed_out or solution < last_solution:
+            path = trace_path(came_from, start_id, end_id)
+            yield [graph.names[i] for i in path], g_score[end_id], bound, checked_names
+        last_solution = solution
+
+        # Stop once the path is good enough, optimal, or the time is up
+        if timed_out or bound <= target_bound or epsilon <= 1.0 or not pending:
+            return
+        if deadline is not None and time.perf_counter() >= deadline:
+            return
+
+        # Lower epsilon below the achieved bound (a larger one cannot improve the path) and search again from the queued and inconsistent nodes
+        epsilon = max(1.0, min(epsilon, bound) - decrease)
+        closed = [False] * graph.num_nodes
+        incons = []
+        f_scores = np.array(pending_g) + coords.estimate(np.array(pending, dtype=np.int64), end_id) * epsilon
+        open_list = list(zip(f_scores.tolist(), pending, pending_g))
+        heapify(open_list)
+
+def astar_sweep(graph, start, end, epsilons, cities_df=None, coords=None, heuristic=None, baseline=None):
+    """Runs weighted A* for every epsilon on one (start, end) pair, returning the Dijkstra baseline and one result per epsilon."""
+    # The baseline is a (path, total_weight, checked_count) tuple like batch_dijkstra returns, one from an earlier
+    # batch_dijkstra search of many ends of a start is reused. Every epsilon gives a (path, total_weight, SearchStats) tuple.
+    coords = select_heuristic(cities_df, coords, heuristic)
+    graph = as_csr_graph(graph, coords.names)
+    coords = align_heuristic(graph, coords)
+    end_id = graph.node_id(end)
+
+    if baseline is None:
+        baseline = batch_dijkstra(graph, [(start, end)])[0]
+
+    # The heuristic toward end is computed once for all nodes as a list, the searches of all epsilons index it
+    # instead of calling coords.estimate for every expanded node
+    estimates = coords.estimate(np.arange(graph.num_nodes), end_id).tolist()
+
+    # Repeated epsilons are searched only once
+    results = {}
+    for e in epsilons:
+        if e not in results:
+            stats = SearchStats(record_checked=False)
+            path, total_weight, _ = astar_csr_stats(graph, start, end, coords, e, stats, estimates)
+            results[e] = (path, total_weight, stats)
+    return baseline, [results[e] for e in epsilons]
+
+def bidirectional_search(graph, start_id, end_id, potential=None, not_found_path=None):
+    """Runs a forward search from start and a backward search from end on an undirected CSRGraph until they meet."""
+    if start_id == end_id:
+        return [graph.names[start_id]], 0.0, [graph.names[start_id]]
+    neighbor_lists = graph.neighbor_lists
+
+    # Index 0 holds the forward search from start, index 1 the backward search from end, as flat lists indexed by node id
+    distances = [[float('inf')] * graph.num_nodes, [float('inf')] * graph.num_nodes]
+    previous_nodes = [[-1] * graph.num_nodes, [-1] * graph.num_nodes]
+    settled = [[False] * graph.num_nodes, [False] * graph.num_nodes]
+    distances[0][start_id] = 0.0
+    distances[1][end_id] = 0.0
+
+    # With a potential p (one value per node id), the forward queue is ordered by d(v) + p(v) and the backward queue by d(v) - p(v)
+    if potential is None:
+        potential = [0.0] * graph.num_nodes
+    key_offsets = [potential, [-p for p in potential]]
+
+    queues = [[(key_offsets[0][start_id], start_id)], [(key_offsets[1][end_id], end_id)]]
+    best_distance = float('inf')  # Length of the shortest path found so far
+    meeting_node = -1  # Node where that path crosses from the forward to the backward search
+    checked_nodes = []
+
+    while queues[0] and queues[1]:
+        # No unsettled node can lie on a shorter path once the smallest keys add up to the best distance
+        if queues[0][0][0] + queues[1][0][0] >= best_distance:
+            break
+
+        # Expand the side with the smaller key
+        side = 0 if queues[0][0][0] <= queues[1][0][0] else 1
+        _, current_node = heappop(queues[side])
+        checked_nodes.append(current_node)
+        if settled[side][current_node]:
+            continue
+        settled[side][current_node] = True
+
+        # Relax the neighbors of the current node
+        own_distances, other_distances, own_previous, own_offsets = distances[side], distances[1 - side], previous_nodes[side], key_offsets[side]
+        current_distance = own_distances[current_node]
+        for neighbor, weight in neighbor_lists[current_node]:
+            distance = current_distance + weight
+            if distance < own_distances[neighbor]:
+                own_distances[neighbor] = distance
+                own_previous[neighbor] = current_node
+                heappush(queues[side], (distance + own_offsets[neighbor], neighbor))
+
+                # Check whether the neighbor connects both searches with a shorter path
+                total = distance + other_distances[neighbor]
+                if total < best_distance:
+                    best_distance = total
+                    meeting_node = neighbor
+
+    # If the searches never met, the end node is not reachable
+    if meeting_node < 0:
+        return not_found_path, float('inf'), [graph.names[i] for i in checked_nodes]
+
+    # Join the forward path to the meeting node with the backward path from it
+    path = trace_path(previous_nodes[0], start_id, meeting_node)
+    node = meeting_node
+    while node != end_id:
+        node = previous_nodes[1][node]
+        path.append(node)
+    return [graph.names[i] for i in path], best_distance, [graph.names[i] for i in checked_nodes]
+
+def bidirectional_dijkstra(graph, start, end):
+    """Implements bidirectional Dijkstra, returning the same (path, weight, checked_nodes) tuple as dijkstra."""
+    graph = as_csr_graph(graph)
+    return bidirectional_search(graph, graph.node_id(start), graph.node_id(end), not_found_path=[])
+
+def bidirectional_astar(graph, start, end, cities_df=None, coords=None, heuristic=None):
+    """Implements bidirectional A* with averaged potentials, returning the same (path, weight, checked_nodes) tuple as astar."""
+    coords = select_heuristic(cities_df, coords, heuristic)
+    graph = as_csr_graph(graph, coords.names)
+    coords = align_heuristic(graph, coords)
+    start_id = graph.node_id(start)
+    end_id = graph.node_id(end)
+
+    # The averaged potential (h(v, end) - h(v, start)) / 2 is consistent for both directions, computed once for all nodes
+    node_ids = np.arange(graph.num_nodes)
+    potential = ((coords.estimate(node_ids, end_id) - coords.estimate(node_ids, start_id)) / 2).tolist()
+    return bidirectional_search(graph, start_id, end_id, potential)
+
+class ShortestPathTree:
+    """Distances and predecessors of all nodes settled by a Dijkstra search from one source, unsettled nodes have inf and -1."""
+
+    def __init__(self, graph, source_id, distances, previous_nodes):
+        self.graph = graph
+        self.source_id = source_id
+        self.distances = distances  # Shortest path distance of every node id from the source
+        self.previous_nodes = previous_nodes  # Predecessor of every node id on its shortest path, -1 for the source
+
+    def distance(self, target):
+        """Returns the shortest path distance to target, inf if it was not settled."""
+        return float(self.distances[self.graph.node_id(target)])
+
+    def path(self, target):
+        """Returns the city-name path from the source to target in O(path length), [] if it was not settled."""
+        return path_from_predecessors(self.graph, self.previous_nodes, self.source_id, target)
+
+def settle_from(graph, source_id, target_ids=None):
+    """Runs one Dijkstra search from source_id until every target id is settled (all nodes if target_ids is None)."""
+    # Returns the distance and predecessor arrays, which node ids were settled (their values are final) and
+    # the number of checked nodes at the moment every target was settled
+    neighbor_lists = graph.neighbor_lists
+
+    # Positions of every target id in the target list (a target may be asked for more than once)
+    remaining = {}
+    for position, target_id in enumerate(target_ids or []):
+        remaining.setdefault(target_id, []).append(position)
+    checked_counts = np.zeros(len(target_ids or []), dtype=np.int64)
+
+    # The search runs on flat lists, which are converted to arrays once it is done
+    distances = [float('inf')] * graph.num_nodes
+    previous_nodes = [-1] * graph.num_nodes
+    settled = [False] * graph.num_nodes
+    distances[source_id] = 0.0
+
+    priority_queue = [(0.0, source_id)]
+    checked = 0
+
+    while priority_queue:
+        current_distance, current_node = heappop(priority_queue)
+        checked += 1
+
+        # If the current node's distance is greater than the stored distance, skip this node
+        if current_distance > distances[current_node]:
+            continue
+        settled[current_node] = True
+
+        # Record when a target is settled and stop once all of them are
+        if current_node in remaining:
+            for position in remaining.pop(current_node):
+                checked_counts[position] = checked
+            if target_ids is not None and not remaining:
+                break
+
+        # Explore the neighbors of the current node
+        for neighbor, weight in neighbor_lists[current_node]:
+            distance = current_distance + weight
+            if distance < distances[neighbor]:
+                distances[neighbor] = distance
+                previous_nodes[neighbor] = current_node
+                heappush(priority_queue, (distance, neighbor))
+
+    # Unreachable targets were checked against the whole search, like dijkstra does
+    for positions in remaining.values():
+        checked_counts[positions] = checked
+    return np.array(distances), np.array(previous_nodes, dtype=np.int64), np.array(settled), checked_counts
+
+def shortest_path_tree(graph, start, targets=None):
+    """Returns the ShortestPathTree of a Dijkstra search from start, stopped early once all targets are settled if targets are given."""
+    graph = as_csr_graph(graph)
+    start_id = graph.node_id(start)
+    target_ids = None if targets is None else [graph.node_id(target) for target in targets]
+    distances, previous_nodes, settled, _ = settle_from(graph, start_id, target_ids)
+
+    # Nodes that were only reached but not settled may still have a shorter path, they are left out of the tree
+    distances[~settled] = np.inf
+    previous_nodes[~settled] = -1
+    return ShortestPathTree(graph, start_id, distances, previous_nodes)
+
+def one_to_many(graph, source, targets=None):
+    """Runs one Dijkstra search from source until every target is settled (all nodes if targets is None)."""
+    # Besides the distance and predecessor arrays (final for all settled nodes), the number of checked nodes at the
+    # moment every target was settled is returned, which is exactly len(checked_nodes) of a dijkstra query to it
+    graph = as_csr_graph(graph)
+    target_ids = None if targets is None else [graph.node_id(target) for target in targets]
+    distances, previous_nodes, _, checked_counts = settle_from(graph, graph.node_id(source), target_ids)
+    return distances, previous_nodes, checked_counts
+
+def path_from_predecessors(graph, previous_nodes, source, target):
+    """Rebuilds the city-name path from source to target out of a predecessor array, [] if target was not reached."""
+    source_id = graph.node_id(source)
+    target_id = graph.node_id(target)
+    if target_id != source_id and previous_nodes[target_id] < 0:
+        return []
+    return [graph.names[i] for i in trace_path(previous_nodes, source_id, target_id)]
+
+def distance_matrix(graph, sources, targets):
+    """Computes the (sources x targets) distance matrix, one predecessor array per source and the checked node counts."""
+    graph = as_csr_graph(graph)
+    target_ids = np.array([graph.node_id(target) for target in targets], dtype=np.int64)
+    distances = np.full((len(sources), len(target_ids)), np.inf)
+    predecessors = np.full((len(sources), graph.num_nodes), -1, dtype=np.int64)
+    checked_counts = np.zeros((len(sources), len(target_ids)), dtype=np.int64)
+
+    # Group the rows by source so every source is searched only once
+    rows_by_source = {}
+    for row, source in enumerate(sources):
+        rows_by_source.setdefault(graph.node_id(source), []).append(row)
+
+    for source_id, rows in rows_by_source.items():
+        source_distances, previous_nodes, source_checked_counts = one_to_many(graph, source_id, target_ids)
+        distances[rows] = source_distances[target_ids]
+        predecessors[rows] = previous_nodes
+        checked_counts[rows] = source_checked_counts
+    return distances, predecessors, checked_counts
+
+def batch_dijkstra(graph, pairs):
+    """Answers a list of (start, end) queries with one search per distinct start, returning (path, total_weight, checked_count) per pair."""
+    graph = as_csr_graph(graph)
+
+    # Group the queries by start node
+    positions_by_start = {}
+    for position, (start, end) in enumerate(pairs):
+        positions_by_start.setdefault(graph.node_id(start), []).append(position)
+
+    results = [None] * len(pairs)
+    for start_id, positions in positions_by_start.items():
+        ends = [pairs[position][1] for position in positions]
+        distances, previous_nodes, checked_counts = one_to_many(graph, start_id, ends)
+        for position, end, checked_count in zip(positions, ends, checked_counts.tolist()):
+            end_id = graph.node_id(end)
+            results[position] = (path_from_predecessors(graph, previous_nodes, start_id, end_id), float(distances[end_id]), checked_count)
+    return results
@@ -0,0 +1,71 @@
+"""
+This module generates synthetic, city-like data with clustered locations for testing the solvers on large graphs offline.
+"""
+
+import struct
+import numpy as np
+import pandas as pd
+
+SHP_FILE = 'SHP/States_shapefile.shp'
+
+def shapefile_bounds(shp_file=SHP_FILE):
+    """Reads the bounding box (min_lng, min_lat, max_lng, max_lat) from the header of a .shp file."""
+    with open(shp_file, 'rb') as file:
+        header = file.read(100)
+
+    # The bounding box is stored as four little-endian doubles at bytes 36 to 68 of the header
+    return struct.unpack('<4d', header[36:68])
+
+def sample_in_bounds(rng, centers, spreads, bounds):
+    """Draws one normally distributed point around every center, points outside of the bounds are drawn again."""
+    min_lng, min_lat, max_lng, max_lat = bounds
+    lats = np.empty(len(centers))
+    lngs = np.empty(len(centers))
+    pending = np.arange(len(centers))
+    while len(pending) > 0:
+        lats[pending] = rng.normal(centers[pending, 0], spreads[pending])
+        lngs[pending] = rng.normal(centers[pending, 1], spreads[pending])
+        inside = (lats[pending] >= min_lat) & (lats[pending] <= max_lat) & (lngs[pending] >= min_lng) & (lngs[pending] <= max_lng)
+        pending = pending[~inside]
+    return lats, lngs
+
+def generate_city_data(num_cities, seed=None, num_clusters=None, background_fraction=0.1, bounds=None):
+    """Generates a DataFrame of num_cities clustered cities with the columns of extract_city_data, sorted by population."""
+    rng = np.random.default_rng(seed)
+    if bounds is None:
+        bounds = shapefile_bounds()
+    min_lng, min_lat, max_lng, max_lat = bounds
+    if num_clusters is None:
+        num_clusters = max(1, int(np.sqrt(num_cities) / 2))
+
+    # Cluster centers lie uniformly in the bounds, their sizes follow a heavy-tailed distribution like real metro areas
+    centers = np.column_stack((rng.uniform(min_lat, max_lat, num_clusters), rng.uniform(min_lng, max_lng, num_clusters)))
+    sizes = rng.pareto(1.2, num_clusters) + 1
+    spreads = 0.3 * np.sqrt(sizes / sizes.min())  # Larger clusters cover a larger area (in degrees)
+
+    # Most cities belong to a cluster, the rest are spread uniformly as rural towns
+    num_background = int(num_cities * background_fraction)
+    num_clustered = num_cities - num_background
+    cluster = rng.choice(num_clusters, size=num_clustered, p=sizes / sizes.sum())
+    cluster_lats, cluster_lngs = sample_in_bounds(rng, centers[cluster], spreads[cluster], bounds)
+    lats = np.concatenate((cluster_lats, rng.uniform(min_lat, max_lat, num_background)))
+    lngs = np.concatenate((cluster_lngs, rng.uniform(min_lng, max_lng, num_background)))
+
+    # Populations are heavy-tailed and shrink with the distance to the cluster center
+    distance = np.hypot(cluster_lats - centers[cluster, 0], cluster_lngs - centers[cluster, 1]) / spreads[cluster]
+    population = 1000 * (rng.pareto(1.1, num_cities) + 1)
+    population[:num_clustered] *= 1 + 20 * np.exp(-distance)
+    population = np.minimum(population, 9000000)  # No city is larger than the largest real ones
+
+    # Cities of a cluster share a region name, which takes the place of the state
+    regions = np.concatenate((cluster, np.full(num_background, -1)))
+    df = pd.DataFrame({
+        'city': [f'City {i}' for i in range(num_cities)],
+        'state_name': np.where(regions >= 0, np.char.add('Region ', regions.astype(str)), 'Rural'),
+        'lat': lats,
+        'lng': lngs,
+        'population': population.astype(np.int64),
+    })
+
+    # Sort by population like the csv, the node ids of a graph follow this order
+    return df.sort_values('population', ascending=False, kind='stable').reset_index(drop=True)